@@ -5,5 +5,6 @@ from book.models import Book
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ("title", "author", "inventory", )
+    list_display = ("title", "author", "inventory", "inventory_shards")
     list_filter = ("author",)
+    readonly_fields = ("inventory_shards",)
@@ -0,0 +1,92 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = "book:catalog:version"
+CATALOG_RESPONSE_KEY = "book:catalog:{version}:{digest}"
+
+
+def get_catalog_version() -> int:
+    """Return the current catalog version, initialising it when missing."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seeding from the clock keeps versions monotonic even if the
+        # counter is evicted from the cache.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> int:
+    """Invalidate every cached catalog response by moving to a new version."""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+        return cache.incr(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog():
+    """
+    Bump the catalog version now and once more after the transaction commits.
+
+    The second bump covers readers that cached the pre-commit state between
+    the write and the commit.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def get_response_cache_key(request) -> str:
+    """
+    Build the cache key of a catalog request under the current version.
+
+    Compute it once, before querying, and use it for both the lookup and the
+    store: data read before a write then never lands under the newer version.
+    """
+    digest = hashlib.md5(
+        request.build_absolute_uri().encode(), usedforsecurity=False
+    ).hexdigest()
+    return CATALOG_RESPONSE_KEY.format(version=get_catalog_version(), digest=digest)
+
+
+def get_cached_response(cache_key):
+    """Return the cached catalog response stored under ``cache_key``, if any."""
+    data = cache.get(cache_key)
+    if data is None:
+        return None
+    return Response(data)
+
+
+def cache_response(cache_key, response):
+    """Store the data of a successful catalog response under ``cache_key``."""
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(
+            cache_key,
+            response.data,
+            timeout=settings.BOOK_CACHE_TIMEOUT,
+        )
+    return response
+
+
+class CatalogCacheMixin:
+    """Serve ``list`` and ``retrieve`` from the versioned catalog cache."""
+
+    def list(self, request, *args, **kwargs):
+        cache_key = get_response_cache_key(request)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        return cache_response(cache_key, super().list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        cache_key = get_response_cache_key(request)
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        return cache_response(cache_key, super().retrieve(request, *args, **kwargs))
@@ -0,0 +1,237 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from book.cache import invalidate_catalog
+from book.models import Book, InventoryShard
+
+SHARDS_KEY = "book:{book_id}:inventory_shards"
+ROLLUP_KEY = "book:{book_id}:inventory_rollup"
+
+
+def get_shard_count(book_id, refresh=False) -> int:
+    """
+    Return how many counter rows the stock of a book is split across.
+
+    The value is cached, so choosing the write path costs no query. Writers
+    guard their UPDATEs against a stale value, and returns, which must not
+    lose a copy, refresh it when they miss.
+    """
+    key = SHARDS_KEY.format(book_id=book_id)
+    shards = None if refresh else cache.get(key)
+    if shards is None:
+        shards = (
+            Book.objects.filter(pk=book_id).values_list("inventory_shards", flat=True).first()
+            or 0
+        )
+        cache.set(key, shards, timeout=None)
+    return shards
+
+
+def _reserve(book_id, shards) -> bool:
+    if not shards:
+        return bool(
+            Book.objects.filter(pk=book_id, inventory__gt=0, inventory_shards=0).update(
+                inventory=F("inventory") - 1
+            )
+        )
+    # Start at a random shard so concurrent writers spread over the rows.
+    start = random.randrange(shards)
+    for offset in range(shards):
+        if InventoryShard.objects.filter(
+            book_id=book_id, index=(start + offset) % shards, count__gt=0
+        ).update(count=F("count") - 1):
+            return True
+    return False
+
+
+def _release(book_id, shards, copies):
+    if not shards:
+        return bool(
+            Book.objects.filter(pk=book_id, inventory_shards=0).update(
+                inventory=F("inventory") + copies
+            )
+        )
+    return bool(
+        InventoryShard.objects.filter(book_id=book_id, index=random.randrange(shards)).update(
+            count=F("count") + copies
+        )
+    )
+
+
+def reserve_copy(book_id) -> bool:
+    """
+    Take one copy of a book out of stock.
+
+    A single conditional ``UPDATE ... SET inventory = inventory - 1 WHERE
+    inventory > 0`` is executed, so concurrent borrowers are serialized by
+    the row lock and the stock can never go below zero. For a sharded book
+    the same UPDATE runs on a random counter row, trying the others only
+    when it is empty. Returns ``False`` when the book is out of stock.
+
+    A refused reservation re-reads the layout and is retried once when it
+    changed, so a stale cached layout never refuses a borrow.
+    """
+    shards = get_shard_count(book_id)
+    reserved = _reserve(book_id, shards)
+    if not reserved:
+        fresh = get_shard_count(book_id, refresh=True)
+        reserved = fresh != shards and _reserve(book_id, fresh)
+    if reserved:
+        invalidate_catalog()
+    return reserved
+
+
+class _PartialReservation(Exception):
+    pass
+
+
+def _reserve_all(shards) -> bool:
+    unsharded = [book_id for book_id, count in shards.items() if not count]
+    try:
+        with transaction.atomic():
+            reserved = Book.objects.filter(
+                pk__in=unsharded, inventory__gt=0, inventory_shards=0
+            ).update(inventory=F("inventory") - 1)
+            if reserved != len(unsharded):
+                raise _PartialReservation
+            for book_id, count in shards.items():
+                if count and not _reserve(book_id, count):
+                    raise _PartialReservation
+    except _PartialReservation:
+        return False
+    return True
+
+
+def reserve_copies(book_ids) -> bool:
+    """
+    Take one copy of each of several distinct books, all or nothing.
+
+    One UPDATE covers every unsharded book; when any of them is out of
+    stock the statement is rolled back and ``False`` is returned. As for a
+    single copy, a refusal is retried once when the layouts changed.
+    """
+    shards = {book_id: get_shard_count(book_id) for book_id in book_ids}
+    if not _reserve_all(shards):
+        fresh = {book_id: get_shard_count(book_id, refresh=True) for book_id in book_ids}
+        if fresh == shards or not _reserve_all(fresh):
+            return False
+    invalidate_catalog()
+    return True
+
+
+def release_copy(book_id, copies=1):
+    """Put returned copies of a book back into stock with a single UPDATE."""
+    shards = get_shard_count(book_id)
+    if not _release(book_id, shards, copies):
+        _release(book_id, get_shard_count(book_id, refresh=True), copies)
+    invalidate_catalog()
+
+
+def release_copies(counts):
+    """
+    Put returned copies of several books back into stock with one UPDATE.
+
+    ``counts`` maps book IDs to the number of copies returned. Sharded books
+    take one more UPDATE each.
+    """
+    if not counts:
+        return
+    sharded = {book_id for book_id in counts if get_shard_count(book_id)}
+    unsharded = {book_id: copies for book_id, copies in counts.items() if book_id not in sharded}
+    if unsharded:
+        released = Book.objects.filter(pk__in=unsharded, inventory_shards=0).update(
+            inventory=F("inventory") + Case(
+                *(When(pk=book_id, then=Value(copies)) for book_id, copies in unsharded.items()),
+                output_field=IntegerField(),
+            )
+        )
+        if released != len(unsharded):
+            # Books sharded in the meantime were skipped by the UPDATE.
+            sharded |= {book_id for book_id in unsharded if get_shard_count(book_id, refresh=True)}
+    for book_id in sharded:
+        if not _release(book_id, get_shard_count(book_id), counts[book_id]):
+            _release(book_id, get_shard_count(book_id, refresh=True), counts[book_id])
+    invalidate_catalog()
+
+
+def set_inventory_shards(book_id, shards, stock=None):
+    """
+    Split the stock of a book across ``shards`` counter rows, 0 to merge it back.
+
+    The current stock, or ``stock`` when given, is moved with the book and
+    its counter rows locked, so no copy is lost while writers switch to the
+    new layout.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book_id)
+        counts = list(
+            InventoryShard.objects.select_for_update()
+            .filter(book_id=book_id)
+            .values_list("count", flat=True)
+        )
+        if stock is None:
+            stock = sum(counts) if book.inventory_shards else book.inventory
+        InventoryShard.objects.filter(book_id=book_id).delete()
+
+        if shards:
+            per_shard, extra = divmod(stock, shards)
+            InventoryShard.objects.bulk_create([
+                InventoryShard(book_id=book_id, index=index, count=per_shard + (index < extra))
+                for index in range(shards)
+            ])
+        Book.objects.filter(pk=book_id).update(inventory=stock, inventory_shards=shards)
+        invalidate_catalog()
+        key = SHARDS_KEY.format(book_id=book_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.set(key, shards, timeout=None))
+
+
+def available_copies(book) -> int:
+    """
+    Return how many copies of ``book`` can be borrowed.
+
+    For a sharded book this is the sum of its counter rows, cached for
+    ``INVENTORY_ROLLUP_TTL`` seconds so readers do not scan them every time.
+    """
+    if not book.inventory_shards:
+        return book.inventory
+    key = ROLLUP_KEY.format(book_id=book.id)
+    total = cache.get(key)
+    if total is None:
+        total = InventoryShard.objects.filter(book_id=book.id).aggregate(
+            total=Coalesce(Sum("count"), 0)
+        )["total"]
+        cache.set(key, total, timeout=settings.INVENTORY_ROLLUP_TTL)
+    return total
+
+
+def refresh_inventory_rollups() -> int:
+    """
+    Copy the summed stock of every sharded book into ``Book.inventory``.
+
+    Listings and filters keep reading the single column; for sharded books it
+    is a rollup at most one refresh interval old. Only books whose stock
+    moved are written, and the catalog is invalidated only when there are
+    any. Returns the number of books updated.
+    """
+    totals = (
+        InventoryShard.objects.filter(book=OuterRef("pk"))
+        .order_by()
+        .values("book")
+        .annotate(total=Sum("count"))
+        .values("total")
+    )
+    total = Coalesce(Subquery(totals), 0)
+    updated = (
+        Book.objects.filter(inventory_shards__gt=0)
+        .exclude(inventory=total)
+        .update(inventory=total)
+    )
+    if updated:
+        invalidate_catalog()
+    return updated
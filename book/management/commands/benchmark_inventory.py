@@ -0,0 +1,78 @@
+import secrets
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from book.inventory import release_copy, reserve_copy, set_inventory_shards
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure borrow/return throughput on one book under contention, "
+        "for each inventory shard count. Needs a database with row locks "
+        "(PostgreSQL); the benchmark book is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument(
+            "--work-ms",
+            type=float,
+            default=5,
+            help="Time spent in each borrow transaction after taking the copy.",
+        )
+        parser.add_argument("--shards", default="0,2,4,8,16")
+
+    def handle(self, *args, **options):
+        for shards in (int(value) for value in options["shards"].split(",")):
+            operations = self.run(shards, options["threads"], options["seconds"], options["work_ms"] / 1000)
+            self.stdout.write(
+                f"{shards or 'no':>3} shards: {operations} borrows in {options['seconds']}s "
+                f"({operations / options['seconds']:.0f}/s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
+
+    @staticmethod
+    def run(shards, threads, seconds, work):
+        book = Book.objects.create(
+            title=f"Benchmark {secrets.token_hex(4)}",
+            author="Benchmark",
+            cover="hard",
+            inventory=threads * 100,
+            daily_fee="1.00",
+        )
+        set_inventory_shards(book.id, shards)
+        deadline = time.monotonic() + seconds
+        barrier = threading.Barrier(threads)
+        counts = []
+
+        def borrower():
+            done = 0
+            try:
+                barrier.wait()
+                while time.monotonic() < deadline:
+                    with transaction.atomic():
+                        reserved = reserve_copy(book.id)
+                        if reserved:
+                            # The rest of a borrow holds the row lock meanwhile.
+                            time.sleep(work)
+                    if reserved:
+                        release_copy(book.id)
+                        done += 1
+                counts.append(done)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=borrower) for _ in range(threads)]
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            book.delete()
+        return sum(counts)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book.inventory import set_inventory_shards
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Split the stock of a book across several counter rows to spread "
+        "write contention, or merge it back into the book with --shards 0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_id", type=int)
+        parser.add_argument("--shards", type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options["shards"] < 0:
+            raise CommandError("--shards cannot be negative.")
+        try:
+            set_inventory_shards(options["book_id"], options["shards"])
+        except Book.DoesNotExist:
+            raise CommandError(f"Book {options['book_id']} does not exist.")
+        book = Book.objects.get(pk=options["book_id"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{book} has {book.inventory} copies in {book.inventory_shards or 'no'} shards."
+        ))
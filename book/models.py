@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -11,11 +12,35 @@ class Book(models.Model):
     author = models.CharField(max_length=64)
     cover = models.CharField(max_length=4, choices=CoverChoices.choices)
     inventory = models.PositiveIntegerField()
+    inventory_shards = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of counter rows the stock is split across; 0 keeps it in this row.",
+    )
     daily_fee = models.DecimalField(decimal_places=2, max_digits=10)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["title"]
         unique_together = ("title", "author")
+        indexes = [
+            models.Index(fields=["title", "id"]),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class InventoryShard(models.Model):
+    """One of the counter rows holding the stock of a sharded book."""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="shards")
+    index = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["book", "index"], name="unique_inventory_shard_index"),
+        ]
+
+    def __str__(self):
+        return f"{self.book} #{self.index}: {self.count}"
@@ -0,0 +1,8 @@
+from library_team_project.pagination import KeysetPagination
+
+
+class BookPagination(KeysetPagination):
+    """Keyset pagination following ``Book.Meta.ordering`` with ``id`` as tiebreaker."""
+    ordering = ("title", "id")
+    page_size = 20
+    max_page_size = 100
@@ -0,0 +1,260 @@
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+
+SEARCH_CONFIG = "simple"
+TRIGRAM_THRESHOLD = 0.3
+TITLE_WEIGHT = 1.0
+AUTHOR_WEIGHT = 0.4
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the trigram set of ``text`` the way ``pg_trgm`` builds it."""
+    result = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(first: set[str], second: set[str]) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class PostgresBookSearch:
+    """
+    Search backed by the ``search_vector`` tsvector column and ``pg_trgm``.
+
+    The column is filled by a database trigger and both it and the
+    title/author columns carry GIN indexes (see ``install_search_support``),
+    so matching never scans the table.
+    """
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return queryset.annotate(
+            rank=Cast(
+                SearchRank(F("search_vector"), search_query)
+                + Greatest(
+                    TrigramSimilarity("title", query),
+                    TrigramSimilarity("author", query) * AUTHOR_WEIGHT,
+                ),
+                output_field=FloatField(),
+            )
+        ).filter(
+            Q(search_vector=search_query)
+            | Q(title__trigram_similar=query)
+            | Q(author__trigram_similar=query)
+        )
+
+
+class InMemoryBookSearch:
+    """
+    In-process inverted word and trigram index over book titles and authors.
+
+    Used where Postgres full-text search is unavailable (SQLite in tests and
+    benchmarks). The index is built from the database on first use and kept
+    up to date by the ``Book`` save/delete signals.
+    """
+
+    def __init__(self, max_results=500):
+        self.max_results = max_results
+        self._lock = threading.RLock()
+        self._built = False
+        self._documents = {}
+        self._words = defaultdict(set)
+        self._trigrams = defaultdict(set)
+
+    @property
+    def built(self):
+        return self._built
+
+    def build(self, rows):
+        """(Re)build the index from ``(id, title, author)`` rows."""
+        with self._lock:
+            self._documents.clear()
+            self._words.clear()
+            self._trigrams.clear()
+            for book_id, title, author in rows:
+                self._add(book_id, title, author)
+            self._built = True
+
+    def ensure_built(self):
+        if self._built:
+            return
+        from book.models import Book
+
+        with self._lock:
+            if not self._built:
+                self.build(
+                    Book.objects.order_by().values_list("id", "title", "author")
+                    .iterator(chunk_size=2000)
+                )
+
+    def update(self, book_id, title, author):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book_id)
+            self._add(book_id, title, author)
+
+    def remove(self, book_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book_id)
+
+    def clear(self):
+        with self._lock:
+            self._built = False
+            self._documents.clear()
+            self._words.clear()
+            self._trigrams.clear()
+
+    def _add(self, book_id, title, author):
+        title_trigrams, author_trigrams = trigrams(title), trigrams(author)
+        self._documents[book_id] = (
+            set(tokenize(title)), set(tokenize(author)), title_trigrams, author_trigrams,
+        )
+        for word in self._documents[book_id][0] | self._documents[book_id][1]:
+            self._words[word].add(book_id)
+        for trigram in title_trigrams | author_trigrams:
+            self._trigrams[trigram].add(book_id)
+
+    def _remove(self, book_id):
+        document = self._documents.pop(book_id, None)
+        if document is None:
+            return
+        title_words, author_words, title_trigrams, author_trigrams = document
+        for word in title_words | author_words:
+            self._words[word].discard(book_id)
+        for trigram in title_trigrams | author_trigrams:
+            self._trigrams[trigram].discard(book_id)
+
+    def rank(self, query):
+        """Return ``[(book_id, score), ...]`` best match first."""
+        self.ensure_built()
+        words = set(tokenize(query))
+        query_trigrams = trigrams(query)
+        if not words:
+            return []
+
+        with self._lock:
+            candidates = set()
+            for word in words:
+                candidates |= self._words.get(word, set())
+
+            # A document sharing less than TRIGRAM_THRESHOLD of the query
+            # trigrams can never reach the similarity threshold.
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigrams.get(trigram, ()))
+            minimum = len(query_trigrams) * TRIGRAM_THRESHOLD
+            candidates.update(book_id for book_id, count in shared.items() if count >= minimum)
+
+            scored = []
+            for book_id in candidates:
+                title_words, author_words, title_trigrams, author_trigrams = self._documents[book_id]
+                word_score = (
+                    TITLE_WEIGHT * len(words & title_words)
+                    + AUTHOR_WEIGHT * len(words & author_words)
+                ) / len(words)
+                title_similarity = similarity(query_trigrams, title_trigrams)
+                author_similarity = similarity(query_trigrams, author_trigrams)
+                if word_score or max(title_similarity, author_similarity) >= TRIGRAM_THRESHOLD:
+                    trigram_score = max(title_similarity, author_similarity * AUTHOR_WEIGHT)
+                    scored.append((book_id, round(word_score + trigram_score, 6)))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:self.max_results]
+
+    def search(self, queryset, query):
+        ranked = self.rank(query)
+        if not ranked:
+            return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        return queryset.filter(pk__in=[book_id for book_id, _ in ranked]).annotate(
+            rank=Case(
+                *(When(pk=book_id, then=Value(score)) for book_id, score in ranked),
+                output_field=FloatField(),
+            )
+        )
+
+
+book_index = InMemoryBookSearch(
+    max_results=getattr(settings, "BOOK_SEARCH_MAX_RESULTS", 500)
+)
+
+
+def get_search_backend(using="default"):
+    """Pick the search backend for the given database connection."""
+    if connections[using].vendor == "postgresql":
+        return PostgresBookSearch()
+    return book_index
+
+
+def search_books(queryset, query):
+    """Filter ``queryset`` down to books matching ``query``, annotated with ``rank``."""
+    return get_search_backend(queryset.db).search(queryset, query)
+
+
+POSTGRES_SEARCH_SQL = f"""
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION book_book_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.author, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS book_book_search_vector_trigger ON book_book;
+CREATE TRIGGER book_book_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, author ON book_book
+    FOR EACH ROW EXECUTE FUNCTION book_book_search_vector_update();
+
+UPDATE book_book SET title = title WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS book_book_search_vector_gin
+    ON book_book USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS book_book_title_trgm
+    ON book_book USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS book_book_author_trgm
+    ON book_book USING gin (author gin_trgm_ops);
+"""
+
+
+def install_search_support(sender, using="default", **kwargs):
+    """
+    Install the tsvector trigger and GIN indexes after migrations on Postgres.
+
+    These objects are Postgres specific, so they are created here rather than
+    through ``Meta.indexes`` to keep the model usable on SQLite.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    if "book_book" not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_SEARCH_SQL)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from book.inventory import set_inventory_shards
 from book.models import Book
 
 
@@ -7,3 +9,12 @@ class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+
+    def update(self, instance, validated_data):
+        """Spread a new stock of a sharded book over its counter rows."""
+        stock = validated_data.pop("inventory", None) if instance.inventory_shards else None
+        instance = super().update(instance, validated_data)
+        if stock is not None:
+            set_inventory_shards(instance.id, instance.inventory_shards, stock=stock)
+            instance.refresh_from_db(fields=["inventory"])
+        return instance
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from book.cache import invalidate_catalog
+from book.inventory import SHARDS_KEY
+from book.models import Book
+from book.search import book_index
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    """Keep the in-process search index in sync with saved books."""
+    book_index.update(instance.id, instance.title, instance.author)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    """Drop deleted books from the in-process search index."""
+    book_index.remove(instance.id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_cached_catalog(sender, instance, **kwargs):
+    """Expire cached book responses whenever a book changes."""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Book)
+def cache_inventory_shards(sender, instance, **kwargs):
+    """Remember the inventory layout, so writers pick their path without a query."""
+    cache.set(SHARDS_KEY.format(book_id=instance.id), instance.inventory_shards, timeout=None)
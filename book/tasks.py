@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from book.inventory import refresh_inventory_rollups
+
+
+@shared_task
+def refresh_inventory():
+    return refresh_inventory_rollups()
@@ -1,3 +1,6 @@
+from base64 import b64encode
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -141,3 +144,135 @@ class AdminBookApiTests(TestCase):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class BookPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_list_is_paginated_by_title_and_id(self):
+        for author in ("C", "A", "B"):
+            sample_book(title="Same Title", author=author)
+        sample_book(title="Another Title", author="Z")
+
+        response = self.client.get(BOOK_URL, {"page_size": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["previous"])
+        self.assertIsNotNone(response.data["next"])
+
+    def test_cursor_walks_through_all_books(self):
+        books = [sample_book(title="Same Title", author=str(i)) for i in range(5)]
+        books.append(sample_book(title="A Title", author="X"))
+        expected = sorted(books, key=lambda book: (book.title, book.id))
+
+        seen = []
+        url = BOOK_URL + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(seen, [book.id for book in expected])
+
+    def test_previous_link_returns_previous_page(self):
+        for i in range(4):
+            sample_book(author=str(i))
+
+        first_page = self.client.get(BOOK_URL, {"page_size": 2})
+        second_page = self.client.get(first_page.data["next"])
+        back = self.client.get(second_page.data["previous"])
+
+        self.assertEqual(back.data["results"], first_page.data["results"])
+
+    def test_page_size_is_capped(self):
+        for i in range(3):
+            sample_book(author=str(i))
+
+        with patch("book.pagination.BookPagination.max_page_size", 2):
+            response = self.client.get(BOOK_URL, {"page_size": 1000})
+
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        cursor = b64encode(b"p=not-json").decode()
+        response = self.client.get(BOOK_URL, {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.admin = create_user(
+            email="admin@test.com",
+            password="testpassword",
+            is_staff=True,
+        )
+
+    def test_repeated_reads_are_served_from_cache(self):
+        book = sample_book()
+        self.client.get(BOOK_URL)
+        self.client.get(detail_url(book.id))
+
+        with self.assertNumQueries(0):
+            list_response = self.client.get(BOOK_URL)
+            detail_response = self.client.get(detail_url(book.id))
+
+        self.assertEqual(list_response.data["results"][0]["id"], book.id)
+        self.assertEqual(detail_response.data["id"], book.id)
+
+    def test_saving_a_book_invalidates_cache(self):
+        book = sample_book()
+        self.client.get(detail_url(book.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.inventory = 3
+            book.save()
+
+        response = self.client.get(detail_url(book.id))
+        self.assertEqual(response.data["inventory"], 3)
+
+    def test_deleting_a_book_invalidates_cache(self):
+        book = sample_book()
+        self.client.get(BOOK_URL)
+
+        self.client.force_authenticate(self.admin)
+        self.client.delete(detail_url(book.id))
+
+        response = self.client.get(BOOK_URL)
+        self.assertEqual(response.data["results"], [])
+
+
+class BookConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_unchanged_list_returns_304(self):
+        sample_book()
+        response = self.client.get(BOOK_URL)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_changed_book_returns_200(self):
+        book = sample_book()
+        etag = self.client.get(detail_url(book.id))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.inventory = 1
+            book.save()
+
+        response = self.client.get(detail_url(book.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_differs_per_url(self):
+        book = sample_book()
+        list_etag = self.client.get(BOOK_URL)["ETag"]
+        detail_etag = self.client.get(detail_url(book.id))["ETag"]
+        self.assertNotEqual(list_etag, detail_etag)
@@ -0,0 +1,217 @@
+import threading
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from django.core.cache import cache
+
+from book.inventory import (
+    SHARDS_KEY,
+    available_copies,
+    refresh_inventory_rollups,
+    release_copy,
+    reserve_copies,
+    reserve_copy,
+    set_inventory_shards,
+)
+from book.models import Book, InventoryShard
+from book.serializers import BookSerializer
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Bestseller",
+        "author": "Test Author",
+        "cover": "hard",
+        "inventory": 20,
+        "daily_fee": "12.2",
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+class ReservationTests(TestCase):
+    def test_reserve_decrements_inventory(self):
+        book = sample_book(inventory=2)
+
+        self.assertTrue(reserve_copy(book.id))
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_reserve_fails_when_out_of_stock(self):
+        book = sample_book(inventory=0)
+
+        self.assertFalse(reserve_copy(book.id))
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_release_increments_inventory(self):
+        book = sample_book(inventory=0)
+
+        release_copy(book.id)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_reservation_updates_only_inventory(self):
+        book = sample_book()
+
+        with self.assertNumQueries(1) as context:
+            reserve_copy(book.id)
+
+        sql = context.captured_queries[0]["sql"]
+        set_clause = sql.split(" SET ")[1].split(" WHERE ")[0]
+        self.assertIn("inventory", set_clause)
+        self.assertNotIn("title", set_clause)
+        self.assertNotIn("updated_at", set_clause)
+
+
+class ShardedInventoryTests(TestCase):
+    def shard_counts(self, book):
+        return list(book.shards.order_by("index").values_list("count", flat=True))
+
+    def test_stock_is_split_and_merged_back(self):
+        book = sample_book(inventory=10)
+
+        set_inventory_shards(book.id, 4)
+        self.assertEqual(self.shard_counts(book), [3, 3, 2, 2])
+
+        set_inventory_shards(book.id, 0)
+        book.refresh_from_db()
+        self.assertEqual((book.inventory, book.inventory_shards), (10, 0))
+        self.assertFalse(InventoryShard.objects.exists())
+
+    def test_reserve_and_release_use_shards(self):
+        book = sample_book(inventory=2)
+        set_inventory_shards(book.id, 4)
+
+        self.assertTrue(reserve_copy(book.id))
+        self.assertTrue(reserve_copy(book.id))
+        self.assertFalse(reserve_copy(book.id))
+        release_copy(book.id)
+
+        self.assertEqual(sum(self.shard_counts(book)), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 2)
+        self.assertEqual(refresh_inventory_rollups(), 1)
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_unchanged_rollups_keep_the_catalog_cache(self):
+        book = sample_book(inventory=2)
+        set_inventory_shards(book.id, 2)
+
+        with patch("book.inventory.invalidate_catalog") as mock_invalidate:
+            self.assertEqual(refresh_inventory_rollups(), 0)
+        mock_invalidate.assert_not_called()
+
+    def test_stale_layout_is_refreshed_on_return(self):
+        book = sample_book(inventory=1)
+        set_inventory_shards(book.id, 2)
+        cache.set(SHARDS_KEY.format(book_id=book.id), 0)
+
+        release_copy(book.id)
+
+        self.assertEqual(sum(self.shard_counts(book)), 2)
+
+    def test_stale_layout_is_refreshed_on_borrow(self):
+        book = sample_book(inventory=1)
+        set_inventory_shards(book.id, 2)
+        cache.set(SHARDS_KEY.format(book_id=book.id), 0)
+
+        self.assertTrue(reserve_copy(book.id))
+        self.assertEqual(sum(self.shard_counts(book)), 0)
+
+    def test_stale_layout_is_refreshed_on_batch_borrow(self):
+        books = [sample_book(title=f"Book {i}", inventory=1) for i in range(2)]
+        set_inventory_shards(books[0].id, 2)
+        cache.set(SHARDS_KEY.format(book_id=books[0].id), 0)
+
+        self.assertTrue(reserve_copies([book.id for book in books]))
+        self.assertEqual(sum(self.shard_counts(books[0])), 0)
+
+    def test_available_copies_sums_shards(self):
+        book = sample_book(inventory=5)
+        set_inventory_shards(book.id, 3)
+        book.refresh_from_db()
+
+        self.assertEqual(available_copies(book), 5)
+
+    def test_new_stock_of_sharded_book_is_spread(self):
+        book = sample_book(inventory=2)
+        set_inventory_shards(book.id, 2)
+        book.refresh_from_db()
+
+        serializer = BookSerializer(book, data={"inventory": 7}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self.shard_counts(book), [4, 3])
+        self.assertEqual(book.inventory, 7)
+
+    def test_batch_reservation_is_all_or_nothing(self):
+        plain = sample_book(title="Plain", inventory=1)
+        sharded = sample_book(title="Sharded", inventory=0)
+        set_inventory_shards(sharded.id, 2)
+
+        self.assertFalse(reserve_copies([plain.id, sharded.id]))
+
+        plain.refresh_from_db()
+        self.assertEqual(plain.inventory, 1)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Hammer a single book from many threads and check no update is lost."""
+    workers = 50
+    stock = 20
+
+    def run_concurrently(self, func, book_id):
+        barrier = threading.Barrier(self.workers)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                barrier.wait()
+                outcome = func(book_id)
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_borrows_never_oversell(self):
+        book = sample_book(inventory=self.stock)
+
+        results = self.run_concurrently(reserve_copy, book.id)
+
+        book.refresh_from_db()
+        self.assertEqual(len(results), self.workers)
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(book.inventory, 0)
+
+    def test_concurrent_returns_lose_no_updates(self):
+        book = sample_book(inventory=0)
+
+        self.run_concurrently(release_copy, book.id)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, self.workers)
+
+    def test_concurrent_borrows_of_sharded_book_never_oversell(self):
+        book = sample_book(inventory=self.stock)
+        set_inventory_shards(book.id, 4)
+
+        results = self.run_concurrently(reserve_copy, book.id)
+
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(sum(book.shards.values_list("count", flat=True)), 0)
@@ -0,0 +1,93 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from book.models import Book
+from book.search import InMemoryBookSearch, book_index, trigrams
+
+BOOK_URL = reverse("book:book-list")
+
+
+def sample_book(**params):
+    defaults = {
+        "title": "Test Title",
+        "author": "Test Author",
+        "cover": "hard",
+        "inventory": 20,
+        "daily_fee": "12.2",
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+class InMemoryBookSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.index = InMemoryBookSearch()
+        self.index.build([
+            (1, "The Hobbit", "J. R. R. Tolkien"),
+            (2, "The Lord of the Rings", "J. R. R. Tolkien"),
+            (3, "Dune", "Frank Herbert"),
+        ])
+
+    def test_trigrams_match_pg_trgm(self):
+        self.assertEqual(trigrams("cat"), {"  c", " ca", "cat", "at "})
+
+    def test_title_match_ranks_above_author_match(self):
+        self.index.update(4, "Tolkien: A Biography", "Humphrey Carpenter")
+
+        ranked = self.index.rank("tolkien")
+
+        self.assertEqual(ranked[0][0], 4)
+        self.assertEqual({book_id for book_id, _ in ranked}, {1, 2, 4})
+
+    def test_typo_matches_by_trigram_similarity(self):
+        ranked = self.index.rank("hobit")
+        self.assertEqual([book_id for book_id, _ in ranked], [1])
+
+    def test_removed_books_are_not_found(self):
+        self.index.remove(3)
+        self.assertEqual(self.index.rank("dune"), [])
+
+
+class BookSearchApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        book_index.clear()
+
+    def test_search_returns_ranked_results(self):
+        biography = sample_book(title="Tolkien", author="Humphrey Carpenter")
+        hobbit = sample_book(title="The Hobbit", author="Tolkien")
+        sample_book(title="Dune", author="Frank Herbert")
+
+        response = self.client.get(BOOK_URL, {"q": "tolkien"})
+
+        self.assertEqual(
+            [book["id"] for book in response.data["results"]],
+            [biography.id, hobbit.id],
+        )
+
+    def test_index_follows_saved_books(self):
+        sample_book(title="Dune", author="Frank Herbert")
+        self.client.get(BOOK_URL, {"q": "dune"})
+
+        book = sample_book(title="Emma", author="Jane Austen")
+        response = self.client.get(BOOK_URL, {"q": "emma"})
+        self.assertEqual([item["id"] for item in response.data["results"]], [book.id])
+
+        book.title = "Persuasion"
+        book.save()
+        response = self.client.get(BOOK_URL, {"q": "emma"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_search_results_are_paginated(self):
+        books = [sample_book(title=f"Dune {i}", author="Frank Herbert") for i in range(5)]
+
+        seen = []
+        url = BOOK_URL + "?q=dune&page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(sorted(seen), [book.id for book in books])
+        self.assertEqual(len(seen), len(set(seen)))
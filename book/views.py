@@ -1,11 +1,68 @@
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets
+from book.cache import CatalogCacheMixin, get_catalog_version
 from book.models import Book
+from book.pagination import BookPagination
 from book.permissions import IsAdminUserOrReadOnly
+from book.search import search_books
 from book.serializers import BookSerializer
+from library_team_project.conditional import ConditionalGetMixin
+from library_team_project.query_budget import QueryBudgetMixin
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
+    CatalogCacheMixin,
+    viewsets.ModelViewSet,
+):
     """ViewSet for viewing and editing Book instances."""
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAdminUserOrReadOnly]
+    pagination_class = BookPagination
+    query_budgets = {
+        "list": 3,
+        "retrieve": 2,
+        "create": 3,
+        "update": 4,
+        "partial_update": 4,
+        "destroy": 7,
+    }
+
+    def get_search_query(self):
+        """Return the stripped ``?q=`` search term for list requests."""
+        if self.action != "list":
+            return ""
+        return self.request.query_params.get("q", "").strip()
+
+    def get_queryset(self):
+        """Get the queryset for books, ranked by relevance when searching."""
+        queryset = self.queryset
+        query = self.get_search_query()
+        if query:
+            queryset = search_books(queryset, query)
+        return queryset
+
+    def get_keyset_ordering(self):
+        """Order search results by rank, everything else by title."""
+        if self.get_search_query():
+            return ("-rank", "id")
+        return self.pagination_class.ordering
+
+    def get_conditional_state(self):
+        """Book responses only change when the catalog version moves."""
+        return {"catalog_version": get_catalog_version()}
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Full-text search over title and author, best match first. (ex. ?q=tolkien)",
+                type={"type": "string"},
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        """List books, optionally filtered by a search query."""
+        return super().list(request, *args, **kwargs)
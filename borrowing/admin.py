@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from borrowing.models import Borrowing
+from book.models import Book
+from book.search import search_books
+from borrowing.models import Borrowing, Hold
 
 
 @admin.register(Borrowing)
@@ -13,3 +15,17 @@ class BorrowingAdmin(admin.ModelAdmin):
     )
     list_filter = ("book", "expected_return_date", "actual_return_date")
     search_fields = ["book__title"]
+
+    def get_search_results(self, request, queryset, search_term):
+        """Match book titles through the indexed book search instead of ILIKE."""
+        if not search_term:
+            return queryset, False
+        books = search_books(Book.objects.all(), search_term).values("pk")
+        return queryset.filter(book__in=books), False
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ("book", "user", "status", "ready_until", "created_at")
+    list_filter = ("status",)
+    raw_id_fields = ("book", "user")
@@ -0,0 +1,101 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from payment.models import ArchivedPayment, Payment
+from .cache import invalidate_borrowings
+from .models import ArchivedBorrowing, Borrowing
+
+logger = logging.getLogger(__name__)
+
+
+def archivable_borrowings(cutoff):
+    """Return borrowings returned before ``cutoff`` with nothing left to pay."""
+    pending = Payment.objects.filter(borrowing=OuterRef("pk"), status=0)
+    return Borrowing.objects.filter(actual_return_date__lt=cutoff).exclude(Exists(pending))
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move one batch of archivable borrowings and their payments to the archive.
+
+    The rows are claimed with ``SKIP LOCKED``, copied and deleted in one
+    transaction, so a crash leaves each borrowing in exactly one table.
+    Returns the numbers of borrowings and payments moved.
+    """
+    with transaction.atomic():
+        borrowings = list(
+            archivable_borrowings(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("id")[:batch_size]
+        )
+        if not borrowings:
+            return 0, 0
+        ids = [borrowing.id for borrowing in borrowings]
+        payments = list(Payment.objects.filter(borrowing_id__in=ids))
+
+        ArchivedBorrowing.objects.bulk_create([
+            ArchivedBorrowing(
+                id=borrowing.id,
+                borrow_date=borrowing.borrow_date,
+                expected_return_date=borrowing.expected_return_date,
+                actual_return_date=borrowing.actual_return_date,
+                book_id=borrowing.book_id,
+                user_id=borrowing.user_id,
+                updated_at=borrowing.updated_at,
+            )
+            for borrowing in borrowings
+        ])
+        ArchivedPayment.objects.bulk_create([
+            ArchivedPayment(
+                id=payment.id,
+                status=payment.status,
+                type=payment.type,
+                borrowing_id=payment.borrowing_id,
+                session_url=payment.session_url,
+                session_id=payment.session_id,
+                money_to_pay=payment.money_to_pay,
+                updated_at=payment.updated_at,
+            )
+            for payment in payments
+        ])
+        Payment.objects.filter(borrowing_id__in=ids).delete()
+        Borrowing.objects.filter(pk__in=ids).delete()
+        invalidate_borrowings(borrowing.user_id for borrowing in borrowings)
+    return len(borrowings), len(payments)
+
+
+def archive_borrowings(older_than_days=None, batch_size=None, pause=None, max_batches=None):
+    """
+    Archive borrowings returned more than ``older_than_days`` days ago.
+
+    Batches of ``batch_size`` rows are moved with a ``pause`` in seconds
+    between them, so the live table is never locked for long and replicas
+    keep up. Returns statistics of the run.
+    """
+    older_than_days = older_than_days or settings.ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    pause = settings.ARCHIVE_BATCH_PAUSE if pause is None else pause
+    max_batches = max_batches or settings.ARCHIVE_MAX_BATCHES
+    cutoff = timezone.now().date() - timedelta(days=older_than_days)
+    stats = {"batches": 0, "borrowings": 0, "payments": 0}
+    started = time.perf_counter()
+
+    while max_batches is None or stats["batches"] < max_batches:
+        borrowings, payments = archive_batch(cutoff, batch_size)
+        if not borrowings:
+            break
+        stats["batches"] += 1
+        stats["borrowings"] += borrowings
+        stats["payments"] += payments
+        if borrowings == batch_size and pause:
+            time.sleep(pause)
+
+    stats["duration"] = round(time.perf_counter() - started, 4)
+    logger.info("Borrowing archival finished: %s", stats)
+    return stats
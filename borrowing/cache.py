@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "borrowing:versions:{scope}"
+
+# Bumped by every change, read by staff, who see every borrower's rows.
+ALL = "all"
+# Bumped by bulk jobs that do not know whose rows they touch.
+EVERYONE = "everyone"
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared_cache() -> bool:
+    """Whether the default cache is seen by every web and worker process."""
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+def get_version(scope) -> int:
+    """Return the version of ``scope``, initialising it when missing."""
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        # Seeding from the clock keeps versions monotonic even if the
+        # counter is evicted from the cache.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(VERSION_KEY.format(scope=scope))
+        except ValueError:
+            get_version(scope)
+            cache.incr(VERSION_KEY.format(scope=scope))
+
+
+def get_borrowings_version(user) -> list:
+    """
+    Return the versions a user's view of borrowings and payments depends on.
+
+    They move whenever a borrowing or payment the user can see changes, so
+    list validators cost no query. Returns ``None`` with a process-local
+    cache, which misses bumps made by workers and other processes.
+    """
+    if not is_shared_cache():
+        return None
+    if user.is_staff:
+        return [get_version(ALL)]
+    return [get_version(EVERYONE), get_version(user.pk)]
+
+
+def invalidate_borrowings(user_ids=None):
+    """
+    Bump the versions of the given borrowers, or of everyone when ``None``.
+
+    As with the catalog, versions are bumped now and once more after the
+    transaction commits.
+    """
+    scopes = [ALL, *({EVERYONE} if user_ids is None else set(user_ids))]
+    bump_versions(scopes)
+    transaction.on_commit(lambda: bump_versions(scopes))
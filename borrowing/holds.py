@@ -0,0 +1,131 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from book.inventory import release_copies, release_copy, reserve_copy
+from book.models import Book
+from .models import Hold
+
+logger = logging.getLogger(__name__)
+
+
+def promote_holds(book_id, copies=1) -> int:
+    """
+    Turn the oldest waiting holds of a book into time-limited reservations.
+
+    A single ``UPDATE ... WHERE id IN (SELECT ... LIMIT copies)`` runs on the
+    ``(book, status, id)`` index. Re-checking the status in the outer query
+    means concurrent returns never promote the same hold twice. Returns the
+    number of holds promoted.
+    """
+    head = (
+        Hold.objects.filter(book_id=book_id, status=Hold.WAITING)
+        .order_by("id")
+        .values("pk")[:copies]
+    )
+    return Hold.objects.filter(pk__in=head, status=Hold.WAITING).update(
+        status=Hold.READY,
+        ready_until=timezone.now() + timedelta(seconds=settings.HOLD_READY_FOR),
+        updated_at=timezone.now(),
+    )
+
+
+def hand_over_copy(book_id):
+    """Reserve a returned copy for the next hold, or put it back in stock."""
+    if not promote_holds(book_id):
+        release_copy(book_id)
+
+
+def hand_over_copies(counts):
+    """
+    Reserve returned copies for waiting holds and put the rest back in stock.
+
+    ``counts`` maps book IDs to the number of copies returned. Only books
+    with waiting holds cost a query each; the rest go back in one UPDATE.
+    """
+    remaining = Counter(counts)
+    held = (
+        Hold.objects.filter(book_id__in=counts, status=Hold.WAITING)
+        .values_list("book_id", flat=True)
+        .distinct()
+    )
+    for book_id in held:
+        remaining[book_id] -= promote_holds(book_id, counts[book_id])
+    release_copies(+remaining)
+
+
+def fulfill_hold(book_id, user) -> bool:
+    """Turn the user's ready hold into a borrowing; ``False`` when there is none."""
+    return bool(
+        Hold.objects.filter(
+            book_id=book_id,
+            user=user,
+            status=Hold.READY,
+            ready_until__gt=timezone.now(),
+        ).update(status=Hold.FULFILLED, updated_at=timezone.now())
+    )
+
+
+def cancel_hold(hold):
+    """
+    Cancel an active hold; a reserved copy goes to the next hold.
+
+    The status is matched by the UPDATEs rather than read from ``hold``, so
+    a hold promoted since it was loaded still hands its copy over.
+    """
+    with transaction.atomic():
+        holds = Hold.objects.filter(pk=hold.pk)
+        if holds.filter(status=Hold.READY).update(status=Hold.CANCELLED, updated_at=timezone.now()):
+            hand_over_copy(hold.book_id)
+            return True
+        return bool(
+            holds.filter(status=Hold.WAITING).update(
+                status=Hold.CANCELLED, updated_at=timezone.now()
+            )
+        )
+
+
+def sweep_holds(batch_size=None):
+    """
+    Expire reservations that were not picked up in time.
+
+    Their copies go to the next waiting holds or back in stock. Waiting holds
+    of books that have copies in stock, e.g. placed while a copy was coming
+    back, are promoted as well. Returns statistics of the run.
+    """
+    batch_size = batch_size or settings.HOLD_SWEEP_BATCH_SIZE
+    stats = {"expired": 0, "promoted": 0}
+    while True:
+        with transaction.atomic():
+            expired = list(
+                Hold.objects.select_for_update(skip_locked=True)
+                .filter(status=Hold.READY, ready_until__lte=timezone.now())
+                .order_by("ready_until")
+                .values_list("pk", "book_id")[:batch_size]
+            )
+            if not expired:
+                break
+            Hold.objects.filter(pk__in=[pk for pk, _ in expired]).update(
+                status=Hold.EXPIRED, updated_at=timezone.now()
+            )
+            hand_over_copies(Counter(book_id for _, book_id in expired))
+        stats["expired"] += len(expired)
+
+    in_stock = Book.objects.filter(
+        inventory__gt=0,
+        pk__in=Hold.objects.filter(status=Hold.WAITING).values("book_id"),
+    ).values_list("pk", flat=True)
+    for book_id in in_stock:
+        with transaction.atomic():
+            while reserve_copy(book_id):
+                if not promote_holds(book_id):
+                    release_copy(book_id)
+                    break
+                stats["promoted"] += 1
+
+    logger.info("Hold sweep finished: %s", stats)
+    return stats
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from borrowing.archive import archive_borrowings
+
+
+class Command(BaseCommand):
+    help = (
+        "Move returned and settled borrowings older than the given age, "
+        "with their payments, to the archive tables in throttled batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--pause", type=float, default=None, help="Seconds to wait between batches.")
+        parser.add_argument("--max-batches", type=int, default=None)
+
+    def handle(self, *args, **options):
+        stats = archive_borrowings(
+            older_than_days=options["older_than_days"],
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['borrowings']} borrowings and {stats['payments']} payments "
+            f"in {stats['batches']} batches ({stats['duration']}s)."
+        ))
@@ -0,0 +1,92 @@
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.notification_backends import get_notification_backend
+from borrowing.notifications import pack_messages
+from borrowing.overdue import check_borrowing_overdue
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the overdue scan and notification fan-out offline against "
+        "a local notification backend. All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--borrowings", type=int, default=5000)
+        parser.add_argument("--notifications", type=int, default=5000)
+        parser.add_argument("--backend", default="memory")
+        parser.add_argument("--path", default=None, help="Output file of the file backend.")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        config = {"BACKEND": options["backend"], "OPTIONS": {}}
+        if options["path"]:
+            config["OPTIONS"]["path"] = options["path"]
+
+        with override_settings(NOTIFICATION_BACKEND=config), transaction.atomic():
+            borrowings = self.create_overdue_borrowings(options["borrowings"])
+            overdue = check_borrowing_overdue(chunk_size=options["chunk_size"])
+
+            backend = get_notification_backend()
+            backend.metrics.reset()
+            entries = (
+                (number, f"New borrowing created.\nID: {borrowing.id}\nBook: {borrowing.book.title}")
+                for number, borrowing in enumerate(
+                    borrowings[i % len(borrowings)] for i in range(options["notifications"])
+                )
+            )
+            started = time.perf_counter()
+            sent, failed = backend.send_batched(
+                (message for _, message in pack_messages(entries)),
+                settings.TELEGRAM_CHAT_ID,
+                settings.NOTIFICATION_BATCH_SIZE,
+            )
+            fan_out = time.perf_counter() - started
+            delivery = backend.metrics.snapshot()
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Overdue scan: {overdue['scanned']} borrowings in {overdue['messages']} "
+            f"messages, {overdue['timings']['total']:.3f}s, delivery {overdue['delivery']}"
+        )
+        self.stdout.write(
+            f"Fan-out: {options['notifications']} notifications in {sent} messages "
+            f"({failed} failed), {fan_out:.3f}s, delivery {delivery}"
+        )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, all data rolled back."))
+
+    @staticmethod
+    def create_overdue_borrowings(count):
+        """Create overdue borrowings without sending signals."""
+        user = get_user_model().objects.create_user(
+            email=f"benchmark-{secrets.token_hex(4)}@example.com"
+        )
+        book = Book.objects.create(
+            title=f"Benchmark {secrets.token_hex(4)}",
+            author="Benchmark",
+            cover="hard",
+            inventory=count,
+            daily_fee="1.00",
+        )
+        borrow_date = timezone.now().date() - timedelta(days=14)
+        return Borrowing.objects.bulk_create([
+            Borrowing(
+                book=book,
+                user=user,
+                borrow_date=borrow_date,
+                expected_return_date=borrow_date + timedelta(days=7),
+            )
+            for _ in range(count)
+        ])
@@ -1,11 +1,43 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import DateField, DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from book.inventory import available_copies
 from book.models import Book
+from .expressions import DaysBetween
 
 FINE_MULTIPLIER = 2
 
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+class BorrowingQuerySet(models.QuerySet):
+    def with_costs(self, today=None):
+        """
+        Annotate ``price_amount`` and ``fine_amount`` computed in SQL.
+
+        ``price_amount`` matches ``Borrowing.price``. ``fine_amount`` matches
+        ``Borrowing.overdue`` for returned borrowings and is the fine accrued
+        by ``today`` for borrowings still out.
+        """
+        today = today or timezone.now().date()
+        returned_on = Coalesce("actual_return_date", Value(today, output_field=DateField()))
+        return self.annotate(
+            price_amount=ExpressionWrapper(
+                (DaysBetween(F("expected_return_date"), F("borrow_date")) + 1) * F("book__daily_fee"),
+                output_field=MONEY,
+            ),
+            fine_amount=ExpressionWrapper(
+                Greatest(DaysBetween(returned_on, F("expected_return_date")), 0)
+                * F("book__daily_fee")
+                * FINE_MULTIPLIER,
+                output_field=MONEY,
+            ),
+        )
+
 
 class Borrowing(models.Model):
     """Model representing the borrowing of a book by a user."""
@@ -22,6 +54,23 @@ class Borrowing(models.Model):
         on_delete=models.CASCADE,
         related_name="borrowings",
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BorrowingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["borrow_date", "id"]),
+            models.Index(fields=["user", "borrow_date", "id"]),
+            models.Index(fields=["user", "actual_return_date"]),
+            # Only unreturned borrowings can be overdue, so the index stays
+            # small however long the history grows.
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_overdue_idx",
+            ),
+        ]
 
     @property
     def price(self):
@@ -41,27 +90,74 @@ class Borrowing(models.Model):
         return 0
 
     @staticmethod
-    def validate_borrowing(book, user_borrowings, expected_return_date, borrow_date, error_to_raise):
-        """Validate the borrowing process for a user and a book."""
-        if book.inventory == 0:
+    def has_pending_payments(user) -> bool:
+        """Check with a single query whether the user has any unpaid payment."""
+        return Borrowing.objects.filter(user=user, payments__status=0).exists()
+
+    @staticmethod
+    def validate_borrowing(book, user, expected_return_date, borrow_date=None, error_to_raise=ValidationError):
+        """
+        Validate the borrowing process for a user and a book.
+
+        Runs at most one query however long the user's history is, and one
+        more for a book out of stock, which the user may hold a copy of.
+        """
+        reserved = available_copies(book) == 0 and Hold.is_ready(book, user)
+        Borrowing.validate_batch_borrowing(
+            [book],
+            user,
+            expected_return_date,
+            borrow_date,
+            error_to_raise,
+            reserved_book_ids={book.id} if reserved else (),
+        )
+
+    @staticmethod
+    def validate_batch_borrowing(
+        books,
+        user,
+        expected_return_date,
+        borrow_date=None,
+        error_to_raise=ValidationError,
+        reserved_book_ids=(),
+    ):
+        """Validate borrowing several books at once, with the same single query."""
+        if borrow_date is None:
+            borrow_date = timezone.now().date()
+
+        out_of_stock = [
+            book for book in books
+            if available_copies(book) == 0 and book.id not in reserved_book_ids
+        ]
+        if len(books) == 1 and out_of_stock:
             raise error_to_raise(
                 "Book is out of stock and cannot be borrowed."
             )
-
-        for borrowing in user_borrowings:
-            if borrowing.payments.filter(status=0).exists():
-                raise error_to_raise("You cannot borrow a new book with pending payments")
+        if out_of_stock:
+            raise error_to_raise(
+                "Books are out of stock and cannot be borrowed: "
+                + ", ".join(book.title for book in out_of_stock)
+            )
 
         if expected_return_date < borrow_date:
             raise error_to_raise("Expected return date cannot be earlier than today.")
 
+        if Borrowing.has_pending_payments(user):
+            raise error_to_raise("You cannot borrow a new book with pending payments")
+
     def clean(self):
-        """Perform data validation for the borrowing."""
-        user_borrowings = Borrowing.objects.filter(user=self.user).all()
+        """
+        Perform data validation for a new borrowing.
+
+        Skipped for existing rows and for borrowings already checked by
+        ``BorrowingSerializer``, so a create is validated exactly once.
+        """
+        if not self._state.adding or getattr(self, "eligibility_checked", False):
+            return
 
         Borrowing.validate_borrowing(
             self.book,
-            user_borrowings,
+            self.user,
             self.expected_return_date,
             self.borrow_date,
             ValidationError,
@@ -82,3 +178,107 @@ class Borrowing(models.Model):
 
     def __str__(self):
         return f"{self.book} ({self.user})"
+
+
+class ArchivedBorrowing(models.Model):
+    """
+    A returned borrowing moved out of the live table by ``archive_borrowings``.
+
+    The original ID is kept, so IDs stay unique across both tables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    borrow_date = models.DateField()
+    expected_return_date = models.DateField()
+    actual_return_date = models.DateField()
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="archived_borrowings",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_borrowings",
+    )
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["borrow_date", "id"]),
+            models.Index(fields=["user", "borrow_date", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.book} ({self.user}), archived"
+
+
+class ReminderLog(models.Model):
+    """A reminder about overdue borrowings sent to a user on a given day."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_reminder_per_user_and_day"),
+        ]
+
+
+class Hold(models.Model):
+    """A patron's place in the queue for a book that is out of stock."""
+    WAITING = 0
+    READY = 1
+    FULFILLED = 2
+    EXPIRED = 3
+    CANCELLED = 4
+
+    STATUS_CHOICES = (
+        (WAITING, "WAITING"),
+        (READY, "READY"),
+        (FULFILLED, "FULFILLED"),
+        (EXPIRED, "EXPIRED"),
+        (CANCELLED, "CANCELLED"),
+    )
+    ACTIVE = (WAITING, READY)
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="holds",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="holds",
+    )
+    status = models.IntegerField(choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ready_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["book", "status", "id"]),
+            models.Index(fields=["status", "ready_until"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "user"],
+                condition=models.Q(status__in=(0, 1)),
+                name="unique_active_hold_per_user_and_book",
+            ),
+        ]
+
+    @staticmethod
+    def is_ready(book, user) -> bool:
+        """Check whether a copy of ``book`` is reserved for ``user``."""
+        return Hold.objects.filter(
+            book=book, user=user, status=Hold.READY, ready_until__gt=timezone.now()
+        ).exists()
+
+    def __str__(self):
+        return f"Hold: {self.book} ({self.user}); Status: {self.get_status_display()};"
@@ -0,0 +1,222 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Register a backend class under a short name usable in settings."""
+
+    def decorator(cls):
+        BACKENDS[name] = cls
+        return cls
+
+    return decorator
+
+
+class LatencyMetrics:
+    """Thread-safe send latency statistics over a window of recent sends."""
+
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def record(self, seconds, messages=1, failed=False):
+        with self._lock:
+            self.count += messages
+            self.total += seconds
+            self._samples.append(seconds)
+            if failed:
+                self.errors += messages
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, errors, total = self.count, self.errors, self.total
+
+        def percentile(share):
+            if not samples:
+                return 0.0
+            return samples[min(int(len(samples) * share), len(samples) - 1)]
+
+        return {
+            "count": count,
+            "errors": errors,
+            "total": round(total, 4),
+            "p50": round(percentile(0.5), 4),
+            "p95": round(percentile(0.95), 4),
+            "max": round(samples[-1] if samples else 0.0, 4),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.count = self.errors = 0
+            self.total = 0.0
+
+
+class BaseNotificationBackend:
+    """
+    Deliver notification messages to a chat.
+
+    Subclasses implement ``deliver``; those that can write several messages
+    in one call set ``supports_batch`` and implement ``deliver_many``.
+    Latency of every call is recorded in ``metrics``.
+    """
+    supports_batch = False
+
+    def __init__(self):
+        self.metrics = LatencyMetrics()
+
+    def send(self, message, chat_id):
+        self._timed(1, self.deliver, message, chat_id)
+
+    def send_many(self, messages, chat_id):
+        messages = list(messages)
+        if not messages:
+            return
+        if not self.supports_batch:
+            for message in messages:
+                self.send(message, chat_id)
+            return
+        self._timed(len(messages), self.deliver_many, messages, chat_id)
+
+    def send_batched(self, messages, chat_id, batch_size):
+        """Send a lazy iterable of messages in batches; return ``(sent, failed)``."""
+        sent = failed = 0
+        messages = iter(messages)
+        if not self.supports_batch:
+            batch_size = 1
+        while batch := list(islice(messages, batch_size)):
+            try:
+                self.send_many(batch, chat_id)
+                sent += len(batch)
+            except Exception as error:
+                failed += len(batch)
+                logger.warning("%d notifications to %s could not be sent: %s", len(batch), chat_id, error)
+        return sent, failed
+
+    def deliver(self, message, chat_id):
+        raise NotImplementedError
+
+    def deliver_many(self, messages, chat_id):
+        raise NotImplementedError
+
+    def _timed(self, messages, deliver, *args):
+        started = time.perf_counter()
+        try:
+            deliver(*args)
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, messages, failed=True)
+            raise
+        self.metrics.record(time.perf_counter() - started, messages)
+
+
+@register_backend("telegram")
+class TelegramBackend(BaseNotificationBackend):
+    def deliver(self, message, chat_id):
+        from borrowing.telegram_helper import send_notification
+
+        send_notification(message, chat_id=chat_id)
+
+
+@register_backend("logging")
+class LoggingBackend(BaseNotificationBackend):
+    supports_batch = True
+
+    def __init__(self, logger="borrowing.notifications.sent", level="INFO"):
+        super().__init__()
+        self.logger = logging.getLogger(logger)
+        self.level = logging.getLevelName(level)
+
+    def deliver(self, message, chat_id):
+        self.logger.log(self.level, "[%s] %s", chat_id, message)
+
+    def deliver_many(self, messages, chat_id):
+        for message in messages:
+            self.deliver(message, chat_id)
+
+
+@register_backend("file")
+class FileBackend(BaseNotificationBackend):
+    """Append messages to a newline-delimited JSON file."""
+    supports_batch = True
+
+    def __init__(self, path="notifications.ndjson"):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, message, chat_id):
+        self.deliver_many([message], chat_id)
+
+    def deliver_many(self, messages, chat_id):
+        sent_at = timezone.now().isoformat()
+        lines = "".join(
+            json.dumps({"sent_at": sent_at, "chat_id": chat_id, "message": message}) + "\n"
+            for message in messages
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+
+@register_backend("memory")
+class MemoryBackend(BaseNotificationBackend):
+    """Keep delivered messages in ``outbox``; used by tests and load runs."""
+    supports_batch = True
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.outbox = []
+
+    def deliver(self, message, chat_id):
+        self.deliver_many([message], chat_id)
+
+    def deliver_many(self, messages, chat_id):
+        with self._lock:
+            self.outbox.extend((chat_id, message) for message in messages)
+
+    def clear(self):
+        with self._lock:
+            self.outbox.clear()
+        self.metrics.reset()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_notification_backend():
+    """Return the process-wide backend configured by ``NOTIFICATION_BACKEND``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = settings.NOTIFICATION_BACKEND
+                backend = config["BACKEND"]
+                cls = BACKENDS[backend] if backend in BACKENDS else import_string(backend)
+                _backend = cls(**config.get("OPTIONS", {}))
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_notification_backend(setting=None, **kwargs):
+    global _backend
+    if setting in (None, "NOTIFICATION_BACKEND"):
+        _backend = None
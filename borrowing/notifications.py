@@ -0,0 +1,205 @@
+import logging
+import threading
+
+from celery import current_app
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .cache import is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+SEQUENCE_KEY = "notifications:{chat_id}:sequence"
+SENT_KEY = "notifications:{chat_id}:sent"
+MESSAGE_KEY = "notifications:{chat_id}:{number}"
+FLUSH_KEY = "notifications:{chat_id}:flush"
+LOCK_KEY = "notifications:{chat_id}:lock"
+
+
+def notify(message, chat_id=None):
+    """Queue a notification to be sent once the current transaction commits."""
+    chat_id = chat_id or settings.TELEGRAM_CHAT_ID
+    transaction.on_commit(
+        lambda: get_notification_queue().put(chat_id, message),
+        robust=True,
+    )
+
+
+class MemoryNotificationQueue:
+    """Keep notifications in process; used by tests and offline runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.messages = []
+
+    def put(self, chat_id, message):
+        with self._lock:
+            self.messages.append((chat_id, message))
+
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+
+
+class CeleryNotificationQueue:
+    """
+    Buffer notifications in the cache and send them from a Celery worker.
+
+    The first notification of a burst schedules a flush after
+    ``NOTIFICATION_COALESCE_WINDOW`` seconds; everything buffered by then
+    is sent as digests, at most ``NOTIFICATION_MESSAGES_PER_FLUSH`` per
+    flush to stay within Telegram's per-chat rate limits.
+
+    A process-local cache is not shared with the worker, so with one each
+    notification is passed in the task arguments instead, uncoalesced.
+    """
+
+    def __init__(self, buffered=None):
+        if buffered is None:
+            buffered = is_shared_cache()
+        self.buffered = buffered
+
+    def put(self, chat_id, message):
+        if not self.buffered:
+            current_app.send_task("borrowing.tasks.send_notification", args=(chat_id, message))
+            return
+        # A flush that read the sequence before the message was stored
+        # claims its slot; the message then takes the next number.
+        while not cache.add(
+            MESSAGE_KEY.format(chat_id=chat_id, number=next_number(chat_id)),
+            message,
+            timeout=settings.NOTIFICATION_BUFFER_TTL,
+        ):
+            pass
+        self.schedule_flush(chat_id)
+
+    def schedule_flush(self, chat_id):
+        if cache.add(FLUSH_KEY.format(chat_id=chat_id), True, timeout=settings.NOTIFICATION_BUFFER_TTL):
+            self.send_flush(chat_id)
+
+    def send_flush(self, chat_id):
+        current_app.send_task(
+            "borrowing.tasks.flush_notifications",
+            args=(chat_id,),
+            countdown=settings.NOTIFICATION_COALESCE_WINDOW,
+        )
+
+
+def next_number(chat_id):
+    """Return the next buffer position of ``chat_id``."""
+    key = SEQUENCE_KEY.format(chat_id=chat_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def pack_messages(entries, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Pack ``(number, text)`` entries into messages no longer than ``limit``.
+
+    Yields ``(last_number, message)``, so a caller can record how far the
+    buffer was sent.
+    """
+    message, last = None, None
+    for number, text in entries:
+        text = text[:limit]
+        if message is not None and len(message) + 2 + len(text) > limit:
+            yield last, message
+            message = None
+        message = text if message is None else f"{message}\n\n{text}"
+        last = number
+    if message is not None:
+        yield last, message
+
+
+def flush_buffer(chat_id, send, max_messages):
+    """
+    Send up to ``max_messages`` digests of the buffered notifications.
+
+    Returns the number of messages sent, or ``None`` when another flush of
+    the chat is running; that one is retried after the coalesce window. If
+    sending fails, the position of the last sent message is kept and the
+    error is raised, so nothing is lost or repeated.
+    """
+    lock_key = LOCK_KEY.format(chat_id=chat_id)
+    if not cache.add(lock_key, True, timeout=settings.NOTIFICATION_FLUSH_LOCK_TIMEOUT):
+        get_notification_queue().send_flush(chat_id)
+        return None
+
+    sent_key = SENT_KEY.format(chat_id=chat_id)
+    try:
+        # New notifications from now on schedule the next flush.
+        cache.delete(FLUSH_KEY.format(chat_id=chat_id))
+        first = (cache.get(sent_key) or 0) + 1
+        last = cache.get(SEQUENCE_KEY.format(chat_id=chat_id)) or 0
+        keys = {
+            number: MESSAGE_KEY.format(chat_id=chat_id, number=number)
+            for number in range(first, last + 1)
+        }
+        buffered = cache.get_many(keys.values())
+        # Empty slots are expired, or taken by a put that has not stored its
+        # message yet. Claiming them makes such a put store it under a new
+        # number instead of behind the sent position.
+        claimed = {
+            key for key in keys.values()
+            if key not in buffered
+            and cache.add(key, None, timeout=settings.NOTIFICATION_BUFFER_TTL)
+        }
+        buffered.update(cache.get_many(
+            key for key in keys.values() if key not in buffered and key not in claimed
+        ))
+        entries = (
+            (number, buffered[key]) for number, key in keys.items() if buffered.get(key) is not None
+        )
+
+        sent, position = 0, first - 1
+        try:
+            for number, message in pack_messages(entries):
+                if sent >= max_messages:
+                    break
+                send(message, chat_id=chat_id)
+                sent, position = sent + 1, number
+            else:
+                position = last
+        finally:
+            cache.set(sent_key, position, timeout=None)
+            # Claimed slots stay until they expire, so a late put still finds them.
+            cache.delete_many([
+                keys[number] for number in range(first, position + 1) if keys[number] not in claimed
+            ])
+    finally:
+        cache.delete(lock_key)
+
+    # Notifications put while sending may have found a flush already pending.
+    if position < (cache.get(SEQUENCE_KEY.format(chat_id=chat_id)) or 0):
+        get_notification_queue().schedule_flush(chat_id)
+    return sent
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_notification_queue():
+    """Return the process-wide queue configured by ``NOTIFICATION_QUEUE``."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = import_string(settings.NOTIFICATION_QUEUE["BACKEND"])()
+    return _queue
+
+
+@receiver(setting_changed)
+def reset_notification_queue(setting=None, **kwargs):
+    global _queue
+    if setting in (None, "NOTIFICATION_QUEUE"):
+        _queue = None
@@ -1,33 +1,186 @@
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import timedelta
 
 from django.conf import settings
 from django.utils import timezone
 
 from .models import Borrowing
-from .telegram_helper import send_notification
+from .notification_backends import get_notification_backend
+from .notifications import TELEGRAM_MESSAGE_LIMIT
 
+logger = logging.getLogger(__name__)
 
-def check_borrowing_overdue():
+
+class PhaseTimer:
+    """Accumulate wall time per named phase of a pipeline."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def track(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = (
+                self.timings.get(phase, 0.0) + time.perf_counter() - started
+            )
+
+
+def overdue_borrowings(today):
+    """Return borrowings due by tomorrow that have not been returned."""
+    return Borrowing.objects.filter(
+        expected_return_date__lte=today + timedelta(days=1),
+        actual_return_date__isnull=True,
+    )
+
+
+def iter_overdue_borrowings(today, chunk_size):
     """
-    Check for any overdue borrowings and send notifications if found.
+    Stream overdue borrowings as plain tuples.
 
-    Queries the database for any borrowings that are overdue and sends a notification to the specified chat ID.
+    ``iterator()`` uses a server-side cursor on Postgres, so only
+    ``chunk_size`` rows are held in memory at a time.
     """
-    borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=timezone.now().date() + timedelta(days=1),
-        actual_return_date__isnull=True,
-    ).select_related("book", "user")
-
-    if borrowings:
-        for borrowing in borrowings:
-            message = (
-                f"Borrowing #{borrowing.id} is overdue.\n"
-                f"Book: {borrowing.book.title} (id: {borrowing.book.id})\n"
-                f"User: {borrowing.user.email} (id: {borrowing.user.id})\n"
-                f"Today: {timezone.now().date()}\n"
-                f"Expected return date: {borrowing.expected_return_date}"
-            )
-            send_notification(message, chat_id=settings.TELEGRAM_CHAT_ID)
+    return (
+        overdue_borrowings(today)
+        .order_by("id")
+        .values_list(
+            "id",
+            "book_id",
+            "book__title",
+            "user_id",
+            "user__email",
+            "expected_return_date",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def render_overdue_entry(row):
+    borrowing_id, book_id, book_title, user_id, user_email, expected_return_date = row
+    return (
+        f"Borrowing #{borrowing_id} is overdue.\n"
+        f"Book: {book_title} (id: {book_id})\n"
+        f"User: {user_email} (id: {user_id})\n"
+        f"Expected return date: {expected_return_date}"
+    )
+
+
+def render_digests(entries, today, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Pack rendered entries into digest messages no longer than ``limit``."""
+    header = f"Overdue borrowings on {today}:"
+    message = header
+    for entry in entries:
+        entry = entry[:limit - len(header) - 2]
+        if len(message) + 2 + len(entry) > limit:
+            yield message
+            message = header
+        message = f"{message}\n\n{entry}"
+    if message != header:
+        yield message
+
+
+def send_with_bounded_concurrency(messages, send, max_workers):
+    """
+    Send messages from a lazy iterable with at most ``max_workers`` in flight.
+
+    Returns ``(sent, failed)`` counts. Messages are pulled from ``messages``
+    only when a worker is free, so producing them stays streaming.
+    """
+    sent = failed = 0
+    in_flight = deque()
+
+    def collect(done):
+        nonlocal sent, failed
+        for future in done:
+            in_flight.remove(future)
+            if future.exception() is None:
+                sent += 1
+            else:
+                failed += 1
+                logger.warning("Overdue digest could not be sent: %s", future.exception())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for message in messages:
+            if len(in_flight) >= max_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.append(executor.submit(send, message))
+        collect(wait(in_flight)[0])
+
+    return sent, failed
+
+
+def check_borrowing_overdue(chunk_size=None, max_workers=None):
+    """
+    Check for any overdue borrowings and send digest notifications if found.
+
+    Overdue borrowings are streamed from the database in chunks, packed into
+    digests within Telegram's message size limit and handed to the
+    notification backend, in batches when it supports them and with bounded
+    concurrency otherwise. Returns statistics on rows scanned, messages sent,
+    the time spent in each phase and the backend's send latency.
+    """
+    chunk_size = chunk_size or settings.OVERDUE_SCAN_CHUNK_SIZE
+    max_workers = max_workers or settings.NOTIFICATION_MAX_WORKERS
+    backend = get_notification_backend()
+    chat_id = settings.TELEGRAM_CHAT_ID
+    today = timezone.now().date()
+    timer = PhaseTimer()
+    scanned = 0
+    started = time.perf_counter()
+
+    def rows():
+        nonlocal scanned
+        iterator = iter_overdue_borrowings(today, chunk_size)
+        while True:
+            with timer.track("scan"):
+                row = next(iterator, None)
+            if row is None:
+                return
+            scanned += 1
+            yield row
+
+    def entries():
+        for row in rows():
+            with timer.track("render"):
+                entry = render_overdue_entry(row)
+            yield entry
+
+    def send(message):
+        backend.send(message, chat_id)
+
+    digests = render_digests(entries(), today)
+    if backend.supports_batch:
+        sent, failed = backend.send_batched(digests, chat_id, settings.NOTIFICATION_BATCH_SIZE)
     else:
-        message = "No borrowings overdue today!"
-        send_notification(message, chat_id=settings.TELEGRAM_CHAT_ID)
+        sent, failed = send_with_bounded_concurrency(digests, send, max_workers)
+
+    if not scanned:
+        send("No borrowings overdue today!")
+        sent = 1
+
+    total = time.perf_counter() - started
+    timings = {
+        "scan": timer.timings.get("scan", 0.0),
+        "render": timer.timings.get("render", 0.0),
+    }
+    # Sending overlaps with scanning, so it is accounted as the remainder.
+    timings["send"] = max(total - timings["scan"] - timings["render"], 0.0)
+    timings["total"] = total
+
+    stats = {
+        "scanned": scanned,
+        "messages": sent,
+        "failed": failed,
+        "timings": {phase: round(seconds, 4) for phase, seconds in timings.items()},
+        "delivery": backend.metrics.snapshot(),
+    }
+    logger.info("Overdue scan finished: %s", stats)
+    return stats
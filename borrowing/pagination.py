@@ -0,0 +1,8 @@
+from library_team_project.pagination import KeysetPagination
+
+
+class BorrowingPagination(KeysetPagination):
+    """Keyset pagination over borrowings, oldest first."""
+    ordering = ("borrow_date", "id")
+    page_size = 20
+    max_page_size = 50
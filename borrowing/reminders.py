@@ -0,0 +1,91 @@
+import logging
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+
+from .models import ReminderLog
+from .notification_backends import get_notification_backend
+from .notifications import TELEGRAM_MESSAGE_LIMIT
+from .overdue import overdue_borrowings
+
+logger = logging.getLogger(__name__)
+
+
+def iter_user_ranges(today, users_per_range):
+    """
+    Yield ``(first_user_id, last_user_id)`` ranges of users to remind.
+
+    Users with a Telegram chat and overdue borrowings are paged by keyset on
+    the primary key, at most ``users_per_range`` per range. Ranges never
+    overlap, so workers can process them without coordination.
+    """
+    users = (
+        get_user_model().objects.exclude(telegram_chat_id="")
+        .filter(Exists(overdue_borrowings(today).filter(user=OuterRef("pk"))))
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    last_id = 0
+    while True:
+        page = list(users.filter(pk__gt=last_id)[:users_per_range])
+        if not page:
+            return
+        yield page[0], page[-1]
+        last_id = page[-1]
+
+
+def render_reminder(rows, today, limit=TELEGRAM_MESSAGE_LIMIT):
+    lines = [
+        f"\"{book_title}\" was due on {expected_return_date}."
+        for _, _, _, book_title, expected_return_date in rows
+    ]
+    message = f"Reminder for {today}: please return your overdue books.\n\n" + "\n".join(lines)
+    return message[:limit]
+
+
+def send_reminders(first_user_id, last_user_id, today):
+    """
+    Remind the users of a range about their overdue borrowings.
+
+    Each user gets one message listing all their overdue books. Users already
+    reminded ``today`` are skipped and successful reminders are logged, so a
+    retried or repeated run does not message anyone twice. Returns statistics
+    of the run.
+    """
+    backend = get_notification_backend()
+    rows = (
+        overdue_borrowings(today)
+        .filter(user_id__gte=first_user_id, user_id__lte=last_user_id)
+        .exclude(user__telegram_chat_id="")
+        .exclude(Exists(ReminderLog.objects.filter(user=OuterRef("user"), date=today)))
+        .order_by("user_id", "id")
+        .values_list("user_id", "user__telegram_chat_id", "id", "book__title", "expected_return_date")
+        .iterator(chunk_size=settings.OVERDUE_SCAN_CHUNK_SIZE)
+    )
+    stats = {"users": 0, "sent": 0, "failed": 0}
+    reminded = []
+    try:
+        for (user_id, chat_id), group in groupby(rows, key=itemgetter(0, 1)):
+            stats["users"] += 1
+            try:
+                backend.send(render_reminder(list(group), today), chat_id)
+            except Exception as error:
+                stats["failed"] += 1
+                logger.warning("Reminder to user %s could not be sent: %s", user_id, error)
+                continue
+            stats["sent"] += 1
+            reminded.append(ReminderLog(user_id=user_id, date=today))
+    finally:
+        ReminderLog.objects.bulk_create(reminded, ignore_conflicts=True)
+    return stats
+
+
+def purge_reminder_logs(today):
+    """Delete reminder logs older than ``REMINDER_LOG_RETENTION_DAYS``."""
+    return ReminderLog.objects.filter(
+        date__lt=today - timedelta(days=settings.REMINDER_LOG_RETENTION_DAYS)
+    ).delete()[0]
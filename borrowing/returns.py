@@ -0,0 +1,74 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.cache import invalidate_borrowings
+from borrowing.fines import upsert_fines
+from borrowing.holds import hand_over_copies
+from borrowing.models import Borrowing, FINE_MULTIPLIER
+from payment.models import Payment
+from payment.tasks import schedule_checkout_session
+
+RETURNED = "returned"
+NOT_FOUND = "not_found"
+ALREADY_RETURNED = "already_returned"
+PAYMENT_PENDING = "payment_pending"
+
+
+def return_borrowings(request, borrowing_ids):
+    """
+    Return many borrowings at once with set-based updates.
+
+    Returns one result dict per requested ID, in request order. Borrowings
+    with a pending payment are skipped, the same as for a single return.
+    """
+    today = timezone.now().date()
+    results = {borrowing_id: {"id": borrowing_id, "status": NOT_FOUND} for borrowing_id in borrowing_ids}
+
+    with transaction.atomic():
+        rows = list(
+            Borrowing.objects.select_for_update(of=("self",))
+            .filter(pk__in=borrowing_ids)
+            .values("id", "user_id", "book_id", "expected_return_date", "actual_return_date", "book__daily_fee")
+        )
+        pending = set(
+            # Fines accrued while the book is out are settled on return.
+            Payment.objects.filter(borrowing_id__in=borrowing_ids, status=0, type=0)
+            .values_list("borrowing_id", flat=True)
+        )
+
+        returnable = []
+        for row in rows:
+            if row["actual_return_date"]:
+                results[row["id"]]["status"] = ALREADY_RETURNED
+            elif row["id"] in pending:
+                results[row["id"]]["status"] = PAYMENT_PENDING
+            else:
+                results[row["id"]]["status"] = RETURNED
+                returnable.append(row)
+
+        Borrowing.objects.filter(pk__in=[row["id"] for row in returnable]).update(
+            actual_return_date=today,
+            updated_at=timezone.now(),
+        )
+        hand_over_copies(Counter(row["book_id"] for row in returnable))
+        invalidate_borrowings(row["user_id"] for row in returnable)
+
+        created, updated = upsert_fines({
+            row["id"]: (today - row["expected_return_date"]).days * row["book__daily_fee"] * FINE_MULTIPLIER
+            for row in returnable
+            if today > row["expected_return_date"]
+        })
+        fines = created + updated
+        # One session per fine, opened by the workers in parallel after commit.
+        for fine in fines:
+            schedule_checkout_session(request, [fine])
+
+    for fine in fines:
+        results[fine.borrowing_id]["fine"] = {
+            "payment_id": fine.id,
+            "money_to_pay": fine.money_to_pay,
+        }
+
+    return [results[borrowing_id] for borrowing_id in borrowing_ids]
@@ -1,32 +1,34 @@
-from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from book.inventory import available_copies
+from book.models import Book
 from book.serializers import BookSerializer
-from borrowing.models import Borrowing
-from payment.serializers import PaymentSerializer
-from user.models import User
+from borrowing.models import ArchivedBorrowing, Borrowing, Hold
+from payment.serializers import PaymentListSerializer, PaymentSerializer
 from user.serializers import UserSerializer
 
 
 class BorrowingSerializer(serializers.ModelSerializer):
     """Serializer for the Borrowing model."""
     def validate(self, attrs):
-        user = self.context["request"].user
-        user_instance = User.objects.get(email=user)
-        user_borrowings = Borrowing.objects.filter(user=user_instance).all()
-        borrow_date = attrs.get("borrow_date", timezone.now().date())
         data = super(BorrowingSerializer, self).validate(attrs=attrs)
         Borrowing.validate_borrowing(
             attrs["book"],
-            user_borrowings,
+            self.context["request"].user,
             attrs["expected_return_date"],
-            borrow_date,
+            attrs.get("borrow_date"),
             error_to_raise=ValidationError
         )
-        attrs["book"].save()
         return data
 
+    def create(self, validated_data):
+        """Create the borrowing without re-running the checks done in ``validate``."""
+        borrowing = Borrowing(**validated_data)
+        borrowing.eligibility_checked = True
+        borrowing.save()
+        return borrowing
+
     class Meta:
         model = Borrowing
         fields = (
@@ -40,6 +42,56 @@ class BorrowingSerializer(serializers.ModelSerializer):
         read_only_fields = ("actual_return_date", "user")
 
 
+class BorrowingBatchSerializer(serializers.Serializer):
+    """Serializer for borrowing several books in one checkout."""
+    MAX_BOOKS = 10
+
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BOOKS,
+    )
+    expected_return_date = serializers.DateField()
+
+    def validate_books(self, book_ids):
+        """Resolve the book IDs with a single query."""
+        if len(set(book_ids)) != len(book_ids):
+            raise ValidationError("Each book can be borrowed only once per checkout.")
+        books = Book.objects.in_bulk(book_ids)
+        missing = [book_id for book_id in book_ids if book_id not in books]
+        if missing:
+            raise ValidationError(f"Books not found: {missing}")
+        return [books[book_id] for book_id in book_ids]
+
+    def validate(self, attrs):
+        Borrowing.validate_batch_borrowing(
+            attrs["books"],
+            self.context["request"].user,
+            attrs["expected_return_date"],
+            error_to_raise=ValidationError,
+        )
+        return attrs
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    """Serializer for returning a crate of borrowings at the library desk."""
+    borrowings = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
+
+    def validate_borrowings(self, borrowing_ids):
+        return list(dict.fromkeys(borrowing_ids))
+
+
+class BorrowingTotalsSerializer(serializers.Serializer):
+    """Serializer for cost totals over borrowings."""
+    borrowings = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=14, decimal_places=2)
+    fine = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
 class BorrowingListSerializer(serializers.ModelSerializer):
     """Serializer for a list of borrowings."""
     book_title = serializers.CharField(source="book.title", read_only=True)
@@ -49,6 +101,8 @@ class BorrowingListSerializer(serializers.ModelSerializer):
         many=True,
         read_only=True
     )
+    price = serializers.DecimalField(source="price_amount", max_digits=10, decimal_places=2, read_only=True)
+    fine = serializers.DecimalField(source="fine_amount", max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Borrowing
@@ -59,15 +113,34 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "actual_return_date",
             "book_title",
             "user_email",
-            "payments"
+            "payments",
+            "price",
+            "fine",
         )
 
 
+class BorrowingHistorySerializer(serializers.Serializer):
+    """Serializer for live and archived borrowings alike."""
+    id = serializers.IntegerField()
+    borrow_date = serializers.DateField()
+    expected_return_date = serializers.DateField()
+    actual_return_date = serializers.DateField(allow_null=True)
+    book_title = serializers.CharField(source="book.title")
+    user_email = serializers.CharField(source="user.email")
+    archived = serializers.SerializerMethodField()
+    payments = PaymentListSerializer(many=True)
+
+    def get_archived(self, borrowing) -> bool:
+        return isinstance(borrowing, ArchivedBorrowing)
+
+
 class BorrowingDetailSerializer(BorrowingSerializer):
     """Detailed serializer for the Borrowing model."""
     book = BookSerializer(many=False, read_only=True)
     user = UserSerializer(many=False, read_only=True)
     payments = PaymentSerializer(many=True, read_only=True)
+    price = serializers.DecimalField(source="price_amount", max_digits=10, decimal_places=2, read_only=True)
+    fine = serializers.DecimalField(source="fine_amount", max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Borrowing
@@ -78,7 +151,9 @@ class BorrowingDetailSerializer(BorrowingSerializer):
             "actual_return_date",
             "book",
             "user",
-            "payments"
+            "payments",
+            "price",
+            "fine",
         )
 
 
@@ -104,3 +179,32 @@ class BorrowingReturnSerializer(serializers.ModelSerializer):
             "book",
             "user",
         )
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    """Serializer for a hold on a book that is out of stock."""
+    status = serializers.CharField(source="get_status_display", read_only=True)
+    book_title = serializers.CharField(source="book.title", read_only=True)
+    position = serializers.IntegerField(read_only=True, allow_null=True)
+
+    def validate_book(self, book):
+        if available_copies(book) > 0:
+            raise ValidationError("Book is in stock, borrow it instead.")
+        if Hold.objects.filter(
+            book=book, user=self.context["request"].user, status__in=Hold.ACTIVE
+        ).exists():
+            raise ValidationError("You already hold this book.")
+        return book
+
+    class Meta:
+        model = Hold
+        fields = (
+            "id",
+            "book",
+            "book_title",
+            "status",
+            "position",
+            "ready_until",
+            "created_at",
+        )
+        read_only_fields = ("ready_until", "created_at")
@@ -1,10 +1,31 @@
-from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from payment.models import Payment
 from borrowing.models import Borrowing
-from .telegram_helper import send_notification
+from .cache import invalidate_borrowings
+from .notifications import notify
+
+
+@receiver(post_save, sender=Borrowing)
+def borrowing_changed(sender, instance, **kwargs):
+    """Move the version of the borrower's lists forward."""
+    invalidate_borrowings([instance.user_id])
+
+
+@receiver(post_save, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    """
+    Move the version of the lists showing the payment forward.
+
+    Only the borrower's ID is read, and not at all when the borrowing was
+    loaded with the payment.
+    """
+    if Payment.borrowing.is_cached(instance):
+        user_id = instance.borrowing.user_id
+    else:
+        user_id = Borrowing.objects.filter(pk=instance.borrowing_id).values_list("user_id", flat=True).first()
+    invalidate_borrowings([user_id])
 
 
 @receiver(post_save, sender=Borrowing)
@@ -18,7 +39,7 @@ def new_borrowing(sender, instance, created, **kwargs):
         created: A boolean; True if a new record was created.
         **kwargs: Additional keyword arguments.
 
-    Sends a notification to the specified chat ID about a newly created borrowing instance.
+    Queues a notification about a newly created borrowing instance, sent once the transaction commits.
     """
     if created:
         message = (
@@ -26,14 +47,44 @@ def new_borrowing(sender, instance, created, **kwargs):
             f"ID: {instance.id}\n"
             f"Book: {instance.book.title}"
         )
-        send_notification(message, chat_id=settings.TELEGRAM_CHAT_ID)
+        notify(message)
+
+
+def notify_batch_borrowing(borrowings):
+    """
+    Send one notification for borrowings created together.
+
+    They are inserted with ``bulk_create``, which sends no ``post_save``.
+    """
+    lines = [
+        f"ID: {borrowing.id}, Book: {borrowing.book.title}"
+        for borrowing in borrowings
+    ]
+    message = (
+        f"{len(borrowings)} new borrowings created at {borrowings[0].borrow_date}.\n"
+        + "\n".join(lines)
+    )
+    notify(message)
+
+
+def payment_completed_message(payment):
+    return (
+        f"Payment for the borrowing ID: {payment.borrowing_id} "
+        f"in the amount of {payment.money_to_pay}$ was completed successful"
+    )
 
 
 @receiver(post_save, sender=Payment)
 def notify_payment_status(sender, instance, **kwargs):
     if instance.status == 1:
-        message = (
-            f"Payment for the borrowing ID: {instance.borrowing_id} "
-            f"in the amount of {instance.money_to_pay}$ was completed successful"
-        )
-        send_notification(message, chat_id=settings.TELEGRAM_CHAT_ID)
+        notify(payment_completed_message(instance))
+
+
+def notify_payments_completed(payments):
+    """
+    Send one notification for payments marked as paid together.
+
+    They are updated in bulk from webhook events, which sends no ``post_save``.
+    """
+    message = "\n".join(payment_completed_message(payment) for payment in payments)
+    notify(message)
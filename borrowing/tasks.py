@@ -1,13 +1,75 @@
+from datetime import date
+
 from celery import shared_task
-import telebot
 
 from django.conf import settings
+from django.utils import timezone
 
+from borrowing.archive import archive_borrowings
+from borrowing.fines import accrue_fines
+from borrowing.holds import sweep_holds
+from borrowing.notification_backends import get_notification_backend
+from borrowing.notifications import flush_buffer
 from borrowing.overdue import check_borrowing_overdue
-
-bot = telebot.TeleBot(settings.TELEGRAM_API_KEY)
+from borrowing.reminders import iter_user_ranges, purge_reminder_logs, send_reminders
 
 
 @shared_task
 def run_task():
     return check_borrowing_overdue()
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True, max_retries=10)
+def flush_notifications(chat_id):
+    """Send the notifications buffered for ``chat_id`` as digests."""
+    return flush_buffer(
+        chat_id,
+        get_notification_backend().send,
+        max_messages=settings.NOTIFICATION_MESSAGES_PER_FLUSH,
+    )
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True, max_retries=10)
+def send_notification(chat_id, message):
+    """Send one notification that could not be buffered."""
+    get_notification_backend().send(message, chat_id=chat_id)
+
+
+@shared_task
+def send_overdue_reminders():
+    """
+    Remind every patron with overdue borrowings, spread across workers.
+
+    Users are split into key-ordered ranges of ``REMINDER_USERS_PER_RANGE``
+    and the ranges are dispatched as a group of chunks, each task handling
+    ``REMINDER_RANGES_PER_TASK`` ranges. Returns the number of ranges.
+    """
+    today = timezone.now().date()
+    purge_reminder_logs(today)
+    ranges = [
+        (first_user_id, last_user_id, today.isoformat())
+        for first_user_id, last_user_id in iter_user_ranges(today, settings.REMINDER_USERS_PER_RANGE)
+    ]
+    if ranges:
+        send_reminder_range.chunks(ranges, settings.REMINDER_RANGES_PER_TASK).group().apply_async()
+    return len(ranges)
+
+
+@shared_task
+def send_reminder_range(first_user_id, last_user_id, day):
+    return send_reminders(first_user_id, last_user_id, date.fromisoformat(day))
+
+
+@shared_task
+def accrue_overdue_fines():
+    return accrue_fines()
+
+
+@shared_task
+def expire_holds():
+    return sweep_holds()
+
+
+@shared_task
+def archive_returned_borrowings():
+    return archive_borrowings()
@@ -1,10 +1,50 @@
-import telebot
+import threading
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-bot = telebot.TeleBot(settings.TELEGRAM_API_KEY)
+_bot = None
+_bot_lock = threading.Lock()
+
+
+def get_bot():
+    """
+    Return the process-wide Telegram bot, building it on first use.
+
+    ``telebot`` is imported here rather than at module level: it is slow to
+    import and most web processes and workers never send a message. All
+    threads share one keep-alive HTTP session with bounded timeouts.
+    """
+    global _bot
+    if _bot is None:
+        with _bot_lock:
+            if _bot is None:
+                import requests
+                import telebot
+                from telebot import apihelper
+
+                session = requests.Session()
+                session.mount(
+                    "https://",
+                    requests.adapters.HTTPAdapter(
+                        pool_connections=1, pool_maxsize=settings.TELEGRAM_POOL_SIZE
+                    ),
+                )
+                apihelper.session = session
+                apihelper.CONNECT_TIMEOUT = settings.TELEGRAM_CONNECT_TIMEOUT
+                apihelper.READ_TIMEOUT = settings.TELEGRAM_READ_TIMEOUT
+                _bot = telebot.TeleBot(settings.TELEGRAM_API_KEY, threaded=False)
+    return _bot
+
+
+@receiver(setting_changed)
+def reset_bot(setting=None, **kwargs):
+    global _bot
+    if setting in (None, "TELEGRAM_API_KEY"):
+        _bot = None
 
 
 def send_notification(message_text, chat_id):
     """Send notification to the specified chat ID."""
-    bot.send_message(chat_id=chat_id, text=message_text)
+    get_bot().send_message(chat_id=chat_id, text=message_text)
@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from borrowing.archive import archive_borrowings
+from borrowing.models import ArchivedBorrowing, Borrowing
+from borrowing.tests.samples import create_user, sample_book, sample_borrowing
+from payment.models import ArchivedPayment, Payment
+
+HISTORY_URL = reverse("borrowing:borrowing-history")
+
+
+@override_settings(ARCHIVE_AFTER_DAYS=30, ARCHIVE_BATCH_PAUSE=0)
+class ArchiveTest(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="reader@test.com", password="testpass")
+        self.book = sample_book()
+
+    def borrow(self, borrow_date, actual_return_date=None, user=None):
+        borrowing = sample_borrowing(self.book, user or self.user)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=borrow_date,
+            expected_return_date=borrow_date,
+            actual_return_date=actual_return_date,
+        )
+        return borrowing
+
+    def pay(self, borrowing, status=1):
+        return Payment.objects.create(
+            borrowing=borrowing, status=status, money_to_pay="5.00", session_id=f"cs_{borrowing.id}"
+        )
+
+    def test_old_settled_borrowings_are_archived(self):
+        old = self.borrow("2000-01-01", "2000-01-05")
+        paid = self.pay(old)
+        unpaid = self.borrow("2000-02-01", "2000-02-05")
+        active = self.borrow("2000-03-01")
+        self.pay(unpaid, status=0)
+
+        stats = archive_borrowings()
+
+        self.assertEqual((stats["borrowings"], stats["payments"]), (1, 1))
+        self.assertEqual(set(Borrowing.objects.values_list("id", flat=True)), {unpaid.id, active.id})
+        archived = ArchivedBorrowing.objects.get()
+        self.assertEqual((archived.id, str(archived.actual_return_date)), (old.id, "2000-01-05"))
+        self.assertEqual(ArchivedPayment.objects.get().id, paid.id)
+        self.assertFalse(Payment.objects.filter(pk=paid.pk).exists())
+
+    def test_archival_runs_in_batches(self):
+        for day in range(1, 6):
+            self.borrow(f"2000-01-0{day}", "2000-01-10")
+
+        stats = archive_borrowings(batch_size=2, max_batches=2)
+
+        self.assertEqual((stats["batches"], stats["borrowings"]), (2, 4))
+        self.assertEqual(archive_borrowings(batch_size=2)["borrowings"], 1)
+
+    def test_history_covers_live_and_archived_borrowings(self):
+        first = self.borrow("2000-01-01", "2000-01-05")
+        self.pay(first)
+        self.borrow("2000-01-03", "2000-01-05", user=create_user(email="other@test.com"))
+        archive_borrowings()
+        second = self.borrow("2000-01-02", "2000-01-05")
+        third = self.borrow("2000-03-01")
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(HISTORY_URL, {"page_size": 2})
+        results = res.data["results"]
+        self.assertEqual([item["id"] for item in results], [first.id, second.id])
+        self.assertEqual([item["archived"] for item in results], [True, False])
+        self.assertEqual(results[0]["payments"][0]["money_to_pay"], "5.00")
+
+        res = client.get(res.data["next"])
+        self.assertEqual([item["id"] for item in res.data["results"]], [third.id])
+        self.assertIsNone(res.data["next"])
+
+    def test_history_rejects_invalid_user_filter(self):
+        client = APIClient()
+        client.force_authenticate(create_user(email="staff@test.com", is_staff=True))
+
+        res = client.get(HISTORY_URL, {"user_id": "abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("user_id", res.data)
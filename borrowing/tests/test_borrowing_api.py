@@ -1,19 +1,31 @@
 from unittest.mock import patch
-from datetime import date
-from django.test import TestCase, RequestFactory
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APIClient
 from rest_framework.utils import json
 
 from borrowing.tests.samples import sample_book, sample_borrowing, create_user
 from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.notifications import get_notification_queue
 from borrowing.serializers import BorrowingListSerializer
 from payment.models import Payment
+from payment.tasks import open_checkout_session
 from payment.tests.test_payment_api import sample_payment
 
 BORROWING_URL = reverse("borrowing:borrowing-list")
 PAYMENTS_URL = reverse("payment:payment-list")
+BATCH_URL = reverse("borrowing:borrowing-borrow-batch")
+BULK_RETURN_URL = reverse("borrowing:borrowing-return-books")
+
+
+def with_costs(borrowing):
+    return Borrowing.objects.with_costs().get(pk=borrowing.pk)
 
 
 def return_url(borrowing_id):
@@ -29,6 +41,7 @@ class PublicBorrowingsApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
 class PrivateBorrowingApiTest(TestCase):
     def setUp(self) -> None:
         self.user = create_user(
@@ -48,11 +61,11 @@ class PrivateBorrowingApiTest(TestCase):
         other_user_borrowing = sample_borrowing(book, other_user)
         res = self.client.get(BORROWING_URL)
 
-        serializer1 = BorrowingListSerializer(user_borrowing)
-        serializer2 = BorrowingListSerializer(other_user_borrowing)
+        serializer1 = BorrowingListSerializer(with_costs(user_borrowing))
+        serializer2 = BorrowingListSerializer(with_costs(other_user_borrowing))
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     @patch("borrowing.tests.samples.get_current_date")
     @patch("borrowing.signals.send_notification", create=True)
@@ -62,14 +75,35 @@ class PrivateBorrowingApiTest(TestCase):
 
         payload = {"expected_return_date": "2050-10-15", "book": book.id}
 
-        response = self.client.post(BORROWING_URL, payload)
+        with patch("payment.tasks.open_checkout_session.delay"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(BORROWING_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-        mock_send_notification.assert_called_once()
+        self.assertEqual(len(get_notification_queue().messages), 1)
 
         updated_book = Book.objects.get(pk=book.id)
         self.assertEqual(updated_book.inventory, book.inventory - 1)
 
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_post_borrowing_queues_session_after_commit(self, mock_delay, mock_send_notification):
+        book = sample_book()
+        payload = {"expected_return_date": "2090-10-15", "book": book.id}
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(BORROWING_URL, payload)
+            mock_delay.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = Payment.objects.get(borrowing_id=response.data["id"])
+        self.assertEqual((payment.status, payment.session_url), (0, ""))
+
+        for callback in callbacks:
+            callback()
+        mock_delay.assert_called_once()
+        self.assertEqual(mock_delay.call_args.args[0], [payment.id])
+
     def test_post_borrowing_book_has_0_inventory(self):
         book = sample_book(inventory=0)
 
@@ -78,7 +112,7 @@ class PrivateBorrowingApiTest(TestCase):
         response = self.client.post(BORROWING_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch("borrowing.signals.send_notification")
+    @patch("borrowing.signals.send_notification", create=True)
     def test_cannot_borrow_if_has_unpaid_payment(self, mock_send_notification):
         book = sample_book()
         borrowing = sample_borrowing(book, self.user)
@@ -111,11 +145,11 @@ class AdminBorrowingApiTest(TestCase):
 
         res = self.client.get(BORROWING_URL, {"is_active": True})
 
-        serializer1 = BorrowingListSerializer(borrowing_active)
-        serializer2 = BorrowingListSerializer(borrowing_non_active)
+        serializer1 = BorrowingListSerializer(with_costs(borrowing_active))
+        serializer2 = BorrowingListSerializer(with_costs(borrowing_non_active))
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
 
     @patch("borrowing.signals.send_notification", create=True)
     def test_filtering_by_user_id(self, mock_send_notification):
@@ -133,13 +167,14 @@ class AdminBorrowingApiTest(TestCase):
 
         res = self.client.get(BORROWING_URL, {"user_id": f"{first_user.id}"})
 
-        serializer1 = BorrowingListSerializer(first_borrowing)
-        serializer2 = BorrowingListSerializer(second_borrowing)
+        serializer1 = BorrowingListSerializer(with_costs(first_borrowing))
+        serializer2 = BorrowingListSerializer(with_costs(second_borrowing))
 
-        self.assertEqual(serializer1.data, json.loads(res.content.decode())[0])
-        self.assertNotEqual(serializer2.data, json.loads(res.content.decode())[0])
+        self.assertEqual(serializer1.data, json.loads(res.content.decode())["results"][0])
+        self.assertNotEqual(serializer2.data, json.loads(res.content.decode())["results"][0])
 
 
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
 class ReturnActionTest(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
@@ -189,3 +224,389 @@ class ReturnActionTest(TestCase):
         get_after_transaction = Book.objects.get(id=book.id)
 
         self.assertEqual(get_after_transaction.inventory, book.inventory + 1)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_return_while_session_is_prepared(self, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        sample_payment(borrowing, session_url="", session_id="")
+
+        response = self.client.post(return_url(borrowing.id))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("payment", response.data)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_expired_session_regenerated_once(self, mock_delay, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        payment = sample_payment(borrowing, session_url="", session_id="")
+        Payment.objects.filter(pk=payment.pk).update(updated_at="2000-01-01T00:00:00Z")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(return_url(borrowing.id))
+            self.client.post(return_url(borrowing.id))
+
+        mock_delay.assert_called_once()
+        self.assertEqual(mock_delay.call_args.args[0], [payment.id])
+
+    @override_settings(PAYMENT_SESSION_RETRY_AFTER=0)
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_regenerated_session_reuses_pending_task_key(self, mock_delay, mock_send_notification):
+        with self.captureOnCommitCallbacks(execute=True):
+            borrowing_id = self.client.post(
+                BORROWING_URL, {"book": sample_book().id, "expected_return_date": "2090-10-10"}
+            ).data["id"]
+        # The first task is still retrying, so the payment has no session yet.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(return_url(borrowing_id))
+
+        first, regenerated = mock_delay.call_args_list
+        self.assertEqual(first.args, regenerated.args)
+
+
+class BorrowingConditionalGetTest(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="etag@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_unchanged_list_returns_304(self, mock_send_notification):
+        sample_borrowing(sample_book(), self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_new_payment_changes_list_etag(self, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        sample_payment(borrowing)
+
+        response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch("borrowing.cache.is_shared_cache", return_value=True)
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_unchanged_list_is_validated_without_queries(self, mock_send_notification, mock_shared):
+        for i in range(3):
+            sample_borrowing(sample_book(title=f"Book {i}"), self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_process_local_cache_validates_lists_from_rows(self, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        # A worker's change, whose version bump this process cannot see.
+        Borrowing.objects.filter(pk=borrowing.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+
+        response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_saving_payment_reuses_loaded_borrowing(self, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        sample_payment(borrowing)
+        payment = borrowing.payments.get()
+
+        with self.assertNumQueries(1):
+            payment.save()
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_list_etag_changes_as_fines_accrue(self, mock_send_notification):
+        sample_borrowing(sample_book(), self.user)
+        etag = self.client.get(BORROWING_URL)["ETag"]
+
+        with patch("borrowing.views.timezone.now", return_value=timezone.now() + timedelta(days=1)):
+            response = self.client.get(BORROWING_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BorrowingEligibilityTest(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="eligible@test.com", password="testpass")
+        self.book = sample_book()
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_pending_payment_check_is_a_single_query(self, mock_send_notification):
+        for _ in range(10):
+            sample_payment(sample_borrowing(self.book, self.user), status=1)
+
+        with self.assertNumQueries(1):
+            Borrowing.validate_borrowing(
+                self.book, self.user, date(2090, 1, 1), error_to_raise=ValidationError
+            )
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_pending_payment_blocks_borrowing(self, mock_send_notification):
+        borrowing = sample_borrowing(self.book, self.user)
+        sample_payment(borrowing, status=1)
+        sample_payment(borrowing, status=0)
+
+        with self.assertRaises(ValidationError):
+            Borrowing.validate_borrowing(self.book, self.user, date(2090, 1, 1))
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_returning_does_not_revalidate(self, mock_send_notification):
+        borrowing = sample_borrowing(self.book, self.user)
+        sample_payment(borrowing)
+        Book.objects.filter(pk=self.book.pk).update(inventory=0)
+        borrowing.refresh_from_db()
+
+        borrowing.actual_return_date = date(2090, 1, 2)
+        borrowing.save()
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_api_create_checks_eligibility_once(self, mock_send_notification):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with patch(
+            "borrowing.models.Borrowing.validate_borrowing",
+            wraps=Borrowing.validate_borrowing,
+        ) as mock_validate, patch(
+            "borrowing.views.BorrowingViewSet.create_payment_for_borrowing"
+        ):
+            client.post(
+                BORROWING_URL,
+                {"expected_return_date": "2090-10-15", "book": self.book.id},
+            )
+
+        mock_validate.assert_called_once()
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class IdempotentBorrowingTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = create_user(email="retry@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.book = sample_book()
+        self.payload = {"expected_return_date": "2090-10-15", "book": self.book.id}
+
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_retry_replays_first_response(self, mock_delay, mock_send_notification):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(BORROWING_URL, self.payload, HTTP_IDEMPOTENCY_KEY="key-1")
+            retry = self.client.post(BORROWING_URL, self.payload, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+        mock_delay.assert_called_once()
+        self.assertIsNotNone(mock_delay.call_args.args[2])
+
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_key_reused_for_other_request_rejected(self, mock_delay, mock_send_notification):
+        self.client.post(BORROWING_URL, self.payload, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        payload = {"expected_return_date": "2090-11-15", "book": self.book.id}
+        response = self.client.post(BORROWING_URL, payload, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_keys_are_scoped_per_user(self, mock_delay, mock_send_notification):
+        self.client.post(BORROWING_URL, self.payload, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        self.client.force_authenticate(create_user(email="other@test.com", password="testpass"))
+        response = self.client.post(BORROWING_URL, self.payload, HTTP_IDEMPOTENCY_KEY="key-1")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Borrowing.objects.count(), 2)
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class BatchBorrowingTest(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="batch@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.books = [sample_book(title=f"Book {i}", inventory=2) for i in range(3)]
+
+    @patch("borrowing.views.notify_batch_borrowing")
+    @patch("payment.tasks.create_checkout_session")
+    def test_batch_borrow_uses_one_session(self, mock_session, mock_notify):
+        mock_session.return_value = {"session_id": "cs_1", "session_url": "https://pay"}
+        payload = {
+            "books": [book.id for book in self.books],
+            "expected_return_date": "2090-10-15",
+        }
+
+        with patch("payment.tasks.open_checkout_session.delay", side_effect=open_checkout_session):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("payment", response.data)
+        self.assertEqual(len(response.data["borrowings"]), 3)
+        mock_session.assert_called_once()
+        self.assertEqual(len(mock_session.call_args.kwargs["line_items"]), 3)
+        mock_notify.assert_called_once()
+        self.assertEqual(Payment.objects.filter(session_id="cs_1").count(), 3)
+        for book in self.books:
+            self.assertEqual(Book.objects.get(pk=book.pk).inventory, 1)
+
+    @patch("payment.tasks.open_checkout_session.delay")
+    def test_batch_is_all_or_nothing(self, mock_delay):
+        Book.objects.filter(pk=self.books[2].pk).update(inventory=0)
+        payload = {
+            "books": [book.id for book in self.books],
+            "expected_return_date": "2090-10-15",
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        mock_delay.assert_not_called()
+        self.assertFalse(Borrowing.objects.exists())
+        self.assertEqual(Book.objects.get(pk=self.books[0].pk).inventory, 2)
+
+    def test_duplicate_books_rejected(self):
+        payload = {
+            "books": [self.books[0].id, self.books[0].id],
+            "expected_return_date": "2090-10-15",
+        }
+
+        response = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class BulkReturnTest(TestCase):
+    def setUp(self) -> None:
+        self.staff = create_user(email="desk@test.com", password="testpass", is_staff=True)
+        self.patron = create_user(email="patron@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.book = sample_book(inventory=5, daily_fee="2.00")
+
+    def test_only_staff_can_bulk_return(self):
+        self.client.force_authenticate(self.patron)
+        response = self.client.post(BULK_RETURN_URL, {"borrowings": [1]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    @patch("payment.tasks.create_checkout_session")
+    def test_bulk_return_reports_per_item(self, mock_session, mock_send_notification):
+        mock_session.return_value = {"session_id": "cs_fine", "session_url": "https://fine"}
+        on_time = sample_borrowing(self.book, self.patron)
+        late = sample_borrowing(self.book, self.patron)
+        Borrowing.objects.filter(pk=late.pk).update(
+            borrow_date="2000-01-01", expected_return_date="2000-01-10"
+        )
+        returned = sample_borrowing(self.book, self.patron, actual_return_date="2001-01-01")
+        pending = sample_borrowing(self.book, self.patron)
+        sample_payment(pending)
+
+        with patch("payment.tasks.open_checkout_session.delay", side_effect=open_checkout_session):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    BULK_RETURN_URL,
+                    {"borrowings": [on_time.id, late.id, returned.id, pending.id, 999999]},
+                    format="json",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = [item["status"] for item in response.data["results"]]
+        self.assertEqual(
+            statuses,
+            ["returned", "returned", "already_returned", "payment_pending", "not_found"],
+        )
+        self.assertIn("payment_id", response.data["results"][1]["fine"])
+        self.assertNotIn("fine", response.data["results"][0])
+        mock_session.assert_called_once()
+
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 7)
+        self.assertIsNotNone(Borrowing.objects.get(pk=on_time.pk).actual_return_date)
+        self.assertIsNone(Borrowing.objects.get(pk=pending.pk).actual_return_date)
+        fine = Payment.objects.get(borrowing=late, type=1)
+        self.assertEqual(fine.session_id, "cs_fine")
+        self.assertGreater(fine.money_to_pay, 0)
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class BorrowingCostTest(TestCase):
+    def setUp(self) -> None:
+        self.staff = create_user(email="desk@test.com", password="testpass", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.cheap = self.borrow(sample_book(title="Cheap", daily_fee="1.00"), "2000-01-01", "2000-01-05")
+        self.dear = self.borrow(
+            sample_book(title="Dear", daily_fee="3.00"), "2000-01-01", "2000-01-02", actual_return_date="2000-01-06"
+        )
+        self.medium = self.borrow(sample_book(title="Medium", daily_fee="2.00"), "2000-01-01", "2000-01-03")
+
+    def borrow(self, book, borrow_date, expected_return_date, **params):
+        borrowing = sample_borrowing(book, self.staff)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=borrow_date, expected_return_date=expected_return_date, **params
+        )
+        return Borrowing.objects.get(pk=borrowing.pk)
+
+    def test_costs_match_properties(self):
+        borrowing = Borrowing.objects.with_costs().get(pk=self.dear.pk)
+
+        self.assertEqual(borrowing.price_amount, self.dear.price)
+        self.assertEqual(borrowing.fine_amount, self.dear.overdue)
+
+    def test_costs_are_shown(self):
+        res = self.client.get(BORROWING_URL, {"is_active": "false"})
+
+        self.assertEqual(
+            (res.data["results"][0]["price"], res.data["results"][0]["fine"]),
+            (str(self.dear.price), f"{self.dear.overdue:.2f}"),
+        )
+        res = self.client.get(reverse("borrowing:borrowing-detail", args=[self.cheap.id]))
+        days_late = (timezone.now().date() - self.cheap.expected_return_date).days
+        self.assertEqual(
+            (res.data["price"], res.data["fine"]), (str(self.cheap.price), f"{days_late * 2}.00")
+        )
+
+    def test_ordering_by_price(self):
+        res = self.client.get(BORROWING_URL, {"ordering": "-price", "page_size": 2})
+
+        self.assertEqual([item["book_title"] for item in res.data["results"]], ["Dear", "Medium"])
+        res = self.client.get(res.data["next"])
+        self.assertEqual([item["book_title"] for item in res.data["results"]], ["Cheap"])
+
+    def test_filtering_by_min_fine(self):
+        res = self.client.get(BORROWING_URL, {"min_fine": "24", "is_active": "false"})
+
+        self.assertEqual([item["id"] for item in res.data["results"]], [self.dear.id])
+        self.assertEqual(
+            self.client.get(BORROWING_URL, {"min_fine": "x"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_totals(self):
+        res = self.client.get(reverse("borrowing:borrowing-totals"), {"is_active": "false"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"borrowings": 1, "price": "6.00", "fine": "24.00"})
+
+    def test_only_staff_can_see_totals(self):
+        self.client.force_authenticate(create_user(email="patron@test.com", password="testpass"))
+
+        res = self.client.get(reverse("borrowing:borrowing-totals"))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,140 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db.models import F, Value
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from borrowing.expressions import DaysBetween
+from borrowing.fines import accrue_fines
+from borrowing.models import Borrowing
+from borrowing.tests.samples import create_user, sample_book, sample_borrowing
+from borrowing.tests.test_borrowing_api import BULK_RETURN_URL, return_url
+from payment.models import Payment
+from payment.tasks import reopen_checkout_sessions
+
+TODAY = date(2023, 6, 10)
+
+
+class AccrueFinesTest(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="late@test.com", password="testpass")
+        self.book = sample_book(daily_fee="1.50")
+
+    def borrow(self, expected_return_date, **params):
+        borrowing = sample_borrowing(self.book, self.user, **params)
+        Borrowing.objects.filter(pk=borrowing.pk).update(expected_return_date=expected_return_date)
+        return borrowing
+
+    def test_days_between(self):
+        borrowing = self.borrow(date(2023, 6, 1))
+
+        days = (
+            Borrowing.objects.filter(pk=borrowing.pk)
+            .annotate(days=DaysBetween(Value(TODAY), F("expected_return_date")))
+            .values_list("days", flat=True)
+            .get()
+        )
+
+        self.assertEqual(days, 9)
+
+    def test_fines_are_accrued_for_unreturned_overdue_borrowings(self):
+        late = self.borrow(date(2023, 6, 1))
+        self.borrow(date(2023, 6, 1), actual_return_date="2023-06-05")
+        self.borrow(TODAY)
+
+        stats = accrue_fines(TODAY)
+
+        fine = Payment.objects.get()
+        self.assertEqual((fine.borrowing_id, fine.type, fine.status), (late.id, 1, 0))
+        self.assertEqual(fine.money_to_pay, Decimal("27.00"))
+        self.assertEqual(fine.session_id, "")
+        self.assertEqual((stats["created"], stats["updated"]), (1, 0))
+
+    def test_accrued_fines_are_updated_in_chunks(self):
+        for _ in range(3):
+            self.borrow(date(2023, 6, 1))
+        accrue_fines(TODAY, chunk_size=2)
+
+        stats = accrue_fines(TODAY + timedelta(days=1), chunk_size=2)
+
+        self.assertEqual((stats["chunks"], stats["created"], stats["updated"]), (2, 0, 3))
+        self.assertEqual(
+            set(Payment.objects.values_list("money_to_pay", flat=True)), {Decimal("30.00")}
+        )
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+@patch("payment.tasks.open_checkout_session.delay")
+class SettleAccruedFineTest(TestCase):
+    def setUp(self) -> None:
+        self.staff = create_user(email="desk@test.com", password="testpass", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.book = sample_book(daily_fee="1.00")
+        self.today = timezone.now().date()
+
+    def accrued_borrowing(self):
+        borrowing = sample_borrowing(self.book, self.staff)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=self.today - timedelta(days=10),
+            expected_return_date=self.today - timedelta(days=3),
+        )
+        accrue_fines(self.today - timedelta(days=1))
+        return borrowing
+
+    def test_return_finalizes_accrued_fine(self, mock_delay):
+        borrowing = self.accrued_borrowing()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(return_url(borrowing.id), {})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fine = Payment.objects.get(borrowing=borrowing)
+        self.assertEqual(fine.money_to_pay, Decimal("6.00"))
+        self.assertEqual(mock_delay.call_args.args[0], [fine.id])
+
+    def test_bulk_return_finalizes_accrued_fine(self, mock_delay):
+        borrowing = self.accrued_borrowing()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(BULK_RETURN_URL, {"borrowings": [borrowing.id]}, format="json")
+
+        fine = Payment.objects.get(borrowing=borrowing)
+        self.assertEqual(response.data["results"][0]["fine"]["payment_id"], fine.id)
+        self.assertEqual(fine.money_to_pay, Decimal("6.00"))
+        mock_delay.assert_called_once()
+
+    def test_fine_sessions_follow_the_amount(self, mock_delay):
+        borrowing = sample_borrowing(self.book, self.staff)
+        Borrowing.objects.filter(pk=borrowing.pk).update(
+            borrow_date=self.today - timedelta(days=10),
+            expected_return_date=self.today - timedelta(days=3),
+        )
+        fines = Payment.objects.filter(borrowing=borrowing)
+
+        def age_fine(**fields):
+            fines.update(updated_at=timezone.now() - timedelta(days=1), **fields)
+
+        accrue_fines(self.today - timedelta(days=2))
+        age_fine()
+        self.assertEqual(reopen_checkout_sessions(), 0)
+
+        age_fine(session_id="cs_2", session_url="https://pay/cs_2")
+        accrue_fines(self.today - timedelta(days=1))
+        self.assertEqual(
+            fines.values_list("money_to_pay", "session_id", "session_url").get(), (Decimal("4.00"), "", "")
+        )
+
+        age_fine(session_id="cs_4", session_url="https://pay/cs_4")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(return_url(borrowing.id), {})
+        fine = fines.get()
+        self.assertEqual((fine.money_to_pay, fine.session_id), (Decimal("6.00"), ""))
+        self.assertEqual(mock_delay.call_args.args[0], [fine.id])
+
+        age_fine()
+        self.assertEqual(reopen_checkout_sessions(), 1)
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.holds import cancel_hold, hand_over_copies, promote_holds, sweep_holds
+from borrowing.models import Hold
+from borrowing.tests.samples import create_user, sample_book, sample_borrowing
+from borrowing.tests.test_borrowing_api import BORROWING_URL, return_url
+
+HOLDS_URL = reverse("borrowing:hold-list")
+
+
+def hold_url(hold_id):
+    return reverse("borrowing:hold-detail", args=[hold_id])
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class HoldApiTest(TestCase):
+    def setUp(self) -> None:
+        self.reader = create_user(email="reader@test.com", password="testpass")
+        self.patron = create_user(email="patron@test.com", password="testpass")
+        self.other = create_user(email="other@test.com", password="testpass")
+        self.book = sample_book(inventory=1)
+        self.borrowing = sample_borrowing(self.book, self.reader)
+        Book.objects.filter(pk=self.book.pk).update(inventory=0)
+        self.client = APIClient()
+
+    def place_hold(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(HOLDS_URL, {"book": self.book.id})
+
+    def test_holds_are_queued(self):
+        self.assertEqual(self.place_hold(self.patron).status_code, status.HTTP_201_CREATED)
+        self.place_hold(self.other)
+
+        res = self.client.get(HOLDS_URL)
+
+        self.assertEqual(res.data[0]["position"], 2)
+        self.assertEqual(res.data[0]["status"], "WAITING")
+
+    def test_cannot_hold_twice_or_in_stock(self):
+        self.place_hold(self.patron)
+
+        self.assertEqual(self.place_hold(self.patron).status_code, status.HTTP_400_BAD_REQUEST)
+        Book.objects.filter(pk=self.book.pk).update(inventory=1)
+        self.assertEqual(self.place_hold(self.other).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_returned_copy_is_reserved_for_next_hold(self):
+        self.place_hold(self.patron)
+        self.place_hold(self.other)
+        self.client.force_authenticate(self.reader)
+
+        self.client.post(return_url(self.borrowing.id), {})
+
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+        ready = Hold.objects.get(status=Hold.READY)
+        self.assertEqual(ready.user, self.patron)
+        self.assertGreater(ready.ready_until, timezone.now())
+
+        self.client.force_authenticate(self.other)
+        res = self.client.post(BORROWING_URL, {"book": self.book.id, "expected_return_date": "2090-10-10"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.patron)
+        res = self.client.post(BORROWING_URL, {"book": self.book.id, "expected_return_date": "2090-10-10"})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Hold.objects.get(pk=ready.pk).status, Hold.FULFILLED)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+
+    def test_cancelled_ready_hold_passes_copy_on(self):
+        hold_id = self.place_hold(self.patron).data["id"]
+        self.place_hold(self.other)
+        promote_holds(self.book.id)
+
+        self.client.force_authenticate(self.patron)
+        res = self.client.delete(hold_url(hold_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Hold.objects.get(pk=hold_id).status, Hold.CANCELLED)
+        self.assertEqual(Hold.objects.get(user=self.other).status, Hold.READY)
+
+
+class HoldQueueTest(TestCase):
+    def setUp(self) -> None:
+        self.book = sample_book(inventory=0)
+        self.users = [create_user(email=f"user{i}@test.com") for i in range(3)]
+        self.holds = [Hold.objects.create(book=self.book, user=user) for user in self.users]
+
+    def test_promotion_takes_oldest_holds(self):
+        self.assertEqual(promote_holds(self.book.id, copies=2), 2)
+        self.assertEqual(promote_holds(self.book.id, copies=5), 1)
+
+        self.assertEqual(Hold.objects.filter(status=Hold.READY).count(), 3)
+
+    def test_bulk_return_releases_copies_without_holds(self):
+        other = sample_book(title="Other", inventory=0)
+
+        hand_over_copies({self.book.id: 1, other.id: 2})
+
+        self.assertEqual(Hold.objects.get(status=Hold.READY), self.holds[0])
+        self.assertEqual(Book.objects.get(pk=other.pk).inventory, 2)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+
+    def test_cancelling_hold_promoted_since_loaded_passes_copy_on(self):
+        hold = Hold.objects.get(pk=self.holds[0].pk)
+        promote_holds(self.book.id)
+
+        self.assertTrue(cancel_hold(hold))
+
+        self.assertEqual(Hold.objects.get(pk=hold.pk).status, Hold.CANCELLED)
+        self.assertEqual(Hold.objects.get(status=Hold.READY), self.holds[1])
+
+    def test_sweep_expires_reservations(self):
+        promote_holds(self.book.id, copies=3)
+        Hold.objects.filter(pk__in=[self.holds[0].pk, self.holds[1].pk]).update(
+            ready_until=timezone.now() - timedelta(minutes=1)
+        )
+
+        stats = sweep_holds()
+
+        self.assertEqual(stats["expired"], 2)
+        self.assertEqual(Hold.objects.filter(status=Hold.EXPIRED).count(), 2)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 2)
+
+    def test_sweep_promotes_holds_of_books_in_stock(self):
+        Book.objects.filter(pk=self.book.pk).update(inventory=2)
+
+        stats = sweep_holds()
+
+        self.assertEqual(stats["promoted"], 2)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).inventory, 0)
+        self.assertEqual(Hold.objects.get(status=Hold.WAITING), self.holds[2])
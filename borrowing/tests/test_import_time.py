@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Total import time allowed for booting a process, in seconds. Generous
+# enough for slow CI machines; a regression usually shows up as one of
+# the lazy modules below being imported eagerly.
+IMPORT_TIME_BUDGET = 2.5
+LAZY_MODULES = ("telebot",)
+
+CELERY_BOOT = (
+    "import django; django.setup(); "
+    "from library_team_project.celery import app; "
+    "app.loader.import_default_modules()"
+)
+
+
+def measure_imports(*args):
+    """Run Python with ``-X importtime``; return imported modules and total seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=BASE_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode:
+        raise AssertionError(result.stderr[-2000:])
+
+    modules, total = set(), 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return modules, total / 1_000_000
+
+
+class ImportTimeBudgetTests(SimpleTestCase):
+    def assert_within_budget(self, modules, seconds):
+        for module in LAZY_MODULES:
+            self.assertFalse(module in modules, f"{module} must be imported lazily")
+        self.assertLess(seconds, IMPORT_TIME_BUDGET)
+
+    def test_manage_py_check(self):
+        self.assert_within_budget(*measure_imports("manage.py", "check"))
+
+    def test_celery_worker_boot(self):
+        self.assert_within_budget(*measure_imports("-c", CELERY_BOOT))
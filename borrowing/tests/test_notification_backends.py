@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from borrowing.notification_backends import (
+    BaseNotificationBackend,
+    FileBackend,
+    LatencyMetrics,
+    MemoryBackend,
+    get_notification_backend,
+)
+
+CHAT_ID = "chat"
+
+
+class FlakyBackend(BaseNotificationBackend):
+    def deliver(self, message, chat_id):
+        if message == "bad":
+            raise RuntimeError("telegram is down")
+
+
+class NotificationBackendTests(SimpleTestCase):
+    @override_settings(NOTIFICATION_BACKEND={"BACKEND": "memory"})
+    def test_backend_is_selected_by_name(self):
+        self.assertIsInstance(get_notification_backend(), MemoryBackend)
+
+    @override_settings(
+        NOTIFICATION_BACKEND={
+            "BACKEND": "borrowing.notification_backends.FileBackend",
+            "OPTIONS": {"path": "sent.ndjson"},
+        }
+    )
+    def test_backend_is_selected_by_path(self):
+        backend = get_notification_backend()
+
+        self.assertIsInstance(backend, FileBackend)
+        self.assertEqual(backend.path, "sent.ndjson")
+
+    def test_file_backend_writes_ndjson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sent.ndjson")
+            backend = FileBackend(path=path)
+
+            backend.send("first", CHAT_ID)
+            backend.send_many(["second", "third"], CHAT_ID)
+
+            with open(path, encoding="utf-8") as file:
+                lines = [json.loads(line) for line in file]
+
+        self.assertEqual([line["message"] for line in lines], ["first", "second", "third"])
+        self.assertTrue(all(line["chat_id"] == CHAT_ID for line in lines))
+
+    def test_send_batched_splits_messages(self):
+        backend = MemoryBackend()
+
+        sent, failed = backend.send_batched(iter(str(i) for i in range(5)), CHAT_ID, 2)
+
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual([message for _, message in backend.outbox], ["0", "1", "2", "3", "4"])
+        self.assertEqual(backend.metrics.snapshot()["count"], 5)
+
+    def test_failures_are_counted(self):
+        backend = FlakyBackend()
+
+        with self.assertLogs("borrowing.notification_backends", "WARNING") as logs:
+            sent, failed = backend.send_batched(iter(["a", "bad", "b"]), CHAT_ID, 2)
+
+        self.assertEqual((sent, failed), (2, 1))
+        self.assertEqual(len(logs.output), 1)
+        snapshot = backend.metrics.snapshot()
+        self.assertEqual((snapshot["count"], snapshot["errors"]), (3, 1))
+
+
+class LatencyMetricsTests(SimpleTestCase):
+    def test_snapshot(self):
+        metrics = LatencyMetrics()
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            metrics.record(seconds)
+        metrics.record(1.0, messages=2, failed=True)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot["count"], 6)
+        self.assertEqual(snapshot["errors"], 2)
+        self.assertEqual(snapshot["p50"], 0.3)
+        self.assertEqual(snapshot["max"], 1.0)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["count"], 0)
@@ -0,0 +1,134 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from borrowing.notifications import (
+    CeleryNotificationQueue,
+    flush_buffer,
+    get_notification_queue,
+    next_number,
+    notify,
+    pack_messages,
+)
+
+CHAT_ID = "chat"
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class NotifyTests(TestCase):
+    def setUp(self) -> None:
+        get_notification_queue().clear()
+
+    def test_notification_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify("Hello", chat_id=CHAT_ID)
+            self.assertEqual(get_notification_queue().messages, [])
+
+        self.assertEqual(get_notification_queue().messages, [(CHAT_ID, "Hello")])
+
+    def test_rolled_back_notification_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                notify("Hello", chat_id=CHAT_ID)
+                transaction.set_rollback(True)
+
+        self.assertEqual(get_notification_queue().messages, [])
+
+
+@patch("borrowing.notifications.current_app.send_task")
+class CeleryNotificationQueueTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.queue = CeleryNotificationQueue(buffered=True)
+
+    def test_burst_is_coalesced_into_one_message(self, mock_send_task):
+        for i in range(3):
+            self.queue.put(CHAT_ID, f"Message {i}")
+        send = Mock()
+
+        sent = flush_buffer(CHAT_ID, send, max_messages=5)
+
+        mock_send_task.assert_called_once()
+        self.assertEqual(sent, 1)
+        send.assert_called_once_with("Message 0\n\nMessage 1\n\nMessage 2", chat_id=CHAT_ID)
+        self.assertEqual(flush_buffer(CHAT_ID, send, max_messages=5), 0)
+
+    def test_rate_limit_leaves_rest_for_next_flush(self, mock_send_task):
+        for i in range(3):
+            self.queue.put(CHAT_ID, str(i) * 3000)
+        send = Mock()
+
+        flush_buffer(CHAT_ID, send, max_messages=1)
+        flush_buffer(CHAT_ID, send, max_messages=1)
+
+        self.assertEqual([call.args[0][0] for call in send.call_args_list], ["0", "1"])
+        # The first put and each flush leaving messages behind schedule a flush.
+        self.assertEqual(mock_send_task.call_count, 3)
+
+    def test_failed_send_is_retried_without_repeats(self, mock_send_task):
+        self.queue.put(CHAT_ID, "First")
+        send = Mock(side_effect=ConnectionError("telegram is down"))
+
+        with self.assertRaises(ConnectionError):
+            flush_buffer(CHAT_ID, send, max_messages=5)
+        self.queue.put(CHAT_ID, "Second")
+        send = Mock()
+        flush_buffer(CHAT_ID, send, max_messages=5)
+
+        send.assert_called_once_with("First\n\nSecond", chat_id=CHAT_ID)
+
+    def test_racing_flush_is_retried(self, mock_send_task):
+        self.queue.put(CHAT_ID, "First")
+        raced = []
+
+        def send_while_racing(message, chat_id):
+            # A notification arrives and its flush runs while this one sends.
+            self.queue.put(CHAT_ID, "Second")
+            raced.append(flush_buffer(CHAT_ID, Mock(), max_messages=5))
+
+        flush_buffer(CHAT_ID, send_while_racing, max_messages=5)
+
+        self.assertEqual(raced, [None])
+        # The first put, the second put and the retry of the losing flush.
+        self.assertEqual(mock_send_task.call_count, 3)
+        send = Mock()
+        flush_buffer(CHAT_ID, send, max_messages=5)
+        send.assert_called_once_with("Second", chat_id=CHAT_ID)
+
+    def test_message_put_during_flush_is_kept(self, mock_send_task):
+        numbers = []
+
+        def next_number_while_flushing(chat_id):
+            numbers.append(next_number(chat_id))
+            if len(numbers) == 1:
+                # A flush runs between taking a number and storing the message.
+                flush_buffer(CHAT_ID, Mock(), max_messages=5)
+            return numbers[-1]
+
+        with patch("borrowing.notifications.next_number", side_effect=next_number_while_flushing):
+            self.queue.put(CHAT_ID, "Late")
+        send = Mock()
+        flush_buffer(CHAT_ID, send, max_messages=5)
+
+        self.assertEqual(numbers, [1, 2])
+        send.assert_called_once_with("Late", chat_id=CHAT_ID)
+
+    def test_process_local_cache_passes_message_to_task(self, mock_send_task):
+        CeleryNotificationQueue().put(CHAT_ID, "Hello")
+
+        mock_send_task.assert_called_once_with(
+            "borrowing.tasks.send_notification", args=(CHAT_ID, "Hello")
+        )
+        self.assertIsNone(cache.get(f"notifications:{CHAT_ID}:sequence"))
+
+
+class PackMessagesTests(TestCase):
+    def test_single_entry_is_sent_unchanged(self):
+        self.assertEqual(list(pack_messages([(1, "Hello")])), [(1, "Hello")])
+
+    def test_messages_respect_limit(self):
+        packed = list(pack_messages([(1, "a" * 6), (2, "b" * 6), (3, "c")], limit=10))
+
+        self.assertEqual(packed, [(1, "a" * 6), (3, "b" * 6 + "\n\nc")])
@@ -0,0 +1,87 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from borrowing.models import Borrowing
+from borrowing.notification_backends import get_notification_backend
+from borrowing.overdue import (
+    check_borrowing_overdue,
+    render_digests,
+    send_with_bounded_concurrency,
+)
+from borrowing.tests.samples import create_user, sample_book, sample_borrowing
+
+
+class RenderDigestsTest(TestCase):
+    def test_digests_respect_size_limit(self):
+        entries = [f"entry {i} " + "x" * 40 for i in range(50)]
+
+        digests = list(render_digests(iter(entries), date(2023, 1, 1), limit=200))
+
+        self.assertGreater(len(digests), 1)
+        self.assertTrue(all(len(digest) <= 200 for digest in digests))
+        joined = "".join(digests)
+        self.assertTrue(all(entry in joined for entry in entries))
+
+    def test_no_entries_no_digest(self):
+        self.assertEqual(list(render_digests(iter([]), date(2023, 1, 1))), [])
+
+
+class BoundedSendTest(TestCase):
+    def test_failures_are_counted(self):
+        def send(message):
+            if message == "bad":
+                raise RuntimeError("telegram is down")
+
+        sent, failed = send_with_bounded_concurrency(iter(["a", "bad", "b"]), send, 2)
+
+        self.assertEqual((sent, failed), (2, 1))
+
+
+@override_settings(NOTIFICATION_BACKEND={"BACKEND": "memory"})
+class CheckBorrowingOverdueTest(TestCase):
+    def setUp(self) -> None:
+        get_notification_backend().clear()
+
+    def create_overdue_borrowings(self, count):
+        user = create_user(email="late@test.com", password="testpass")
+        book = sample_book()
+        for _ in range(count):
+            borrowing = sample_borrowing(book, user)
+            Borrowing.objects.filter(pk=borrowing.pk).update(expected_return_date="2000-01-01")
+        sample_borrowing(book, user)
+
+    def test_overdue_borrowings_are_sent_as_digest(self):
+        self.create_overdue_borrowings(3)
+
+        stats = check_borrowing_overdue(chunk_size=2)
+
+        outbox = get_notification_backend().outbox
+        self.assertEqual(stats["scanned"], 3)
+        self.assertEqual(stats["messages"], 1)
+        self.assertEqual(len(outbox), 1)
+        self.assertEqual(outbox[0][1].count("is overdue"), 3)
+        self.assertEqual(set(stats["timings"]), {"scan", "render", "send", "total"})
+        self.assertEqual(stats["delivery"]["count"], 1)
+
+    def test_no_overdue_borrowings(self):
+        stats = check_borrowing_overdue()
+
+        self.assertEqual(stats["scanned"], 0)
+        self.assertEqual(
+            get_notification_backend().outbox,
+            [(settings.TELEGRAM_CHAT_ID, "No borrowings overdue today!")],
+        )
+
+    @override_settings(NOTIFICATION_BACKEND={"BACKEND": "telegram"})
+    @patch("borrowing.telegram_helper.send_notification")
+    def test_telegram_backend_sends_concurrently(self, mock_send):
+        self.create_overdue_borrowings(2)
+
+        stats = check_borrowing_overdue()
+
+        self.assertEqual(stats["messages"], 1)
+        mock_send.assert_called_once()
+        self.assertEqual(mock_send.call_args.args[0].count("is overdue"), 2)
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from borrowing.models import Borrowing
+from borrowing.overdue import overdue_borrowings
+from borrowing.tests.samples import sample_book
+from library_team_project.query_plans import analyze, sequential_scans
+from payment.models import Payment
+
+TODAY = date(2023, 6, 1)
+USERS = 200
+BORROWINGS_PER_USER = 100
+
+LARGE_TABLES = {Borrowing._meta.db_table, Payment._meta.db_table}
+
+
+class HotQueryPlanTest(TestCase):
+    """
+    ``EXPLAIN`` the hot queries against a seeded dataset.
+
+    Most borrowings are returned and paid, as in production, so every hot
+    query is selective and must not read the borrowing or payment tables
+    sequentially.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"reader{i}@test.com") for i in range(USERS)
+        )
+        books = [sample_book(title=f"Book {i}") for i in range(10)]
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=user,
+                book=books[i % len(books)],
+                expected_return_date=TODAY - timedelta(days=i),
+                # One borrowing in fifty is still out.
+                actual_return_date=None if i % 50 == 0 else TODAY - timedelta(days=i),
+            )
+            for user in users
+            for i in range(BORROWINGS_PER_USER)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                status=0 if borrowing.actual_return_date is None else 1,
+                money_to_pay="5.00",
+                session_id=f"cs_{borrowing.id}",
+            )
+            for borrowing in borrowings
+        )
+        analyze(Borrowing, Payment, get_user_model())
+        cls.user = users[USERS // 2]
+        cls.borrowing = borrowings[len(borrowings) // 2]
+
+    def assertNoSequentialScans(self, queryset):
+        self.assertEqual(sequential_scans(queryset, LARGE_TABLES), [], queryset.explain())
+
+    def test_active_borrowings_of_user(self):
+        self.assertNoSequentialScans(
+            Borrowing.objects.filter(user=self.user, actual_return_date__isnull=True)
+        )
+
+    def test_overdue_borrowings(self):
+        self.assertNoSequentialScans(overdue_borrowings(TODAY).order_by("id"))
+
+    def test_accruing_fines(self):
+        self.assertNoSequentialScans(
+            Borrowing.objects.filter(actual_return_date__isnull=True, expected_return_date__lt=TODAY)
+            .with_costs(TODAY)
+            .order_by("id")
+        )
+
+    def test_pending_payment_of_borrowing(self):
+        self.assertNoSequentialScans(
+            Payment.objects.filter(borrowing=self.borrowing, status=0, type=0)
+        )
+
+    def test_pending_payments_of_user(self):
+        self.assertNoSequentialScans(
+            Borrowing.objects.filter(user=self.user, payments__status=0)
+        )
+
+    def test_payments_by_checkout_session(self):
+        self.assertNoSequentialScans(
+            Payment.objects.filter(session_id__in=["cs_1", "cs_2"], status=0)
+        )
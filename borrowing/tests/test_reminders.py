@@ -0,0 +1,80 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from borrowing.models import Borrowing, ReminderLog
+from borrowing.notification_backends import get_notification_backend
+from borrowing.reminders import iter_user_ranges, purge_reminder_logs, send_reminders
+from borrowing.tasks import send_overdue_reminders
+from borrowing.tests.samples import create_user, sample_book, sample_borrowing
+
+TODAY = date(2023, 6, 1)
+
+
+@override_settings(NOTIFICATION_BACKEND={"BACKEND": "memory"})
+class ReminderTests(TestCase):
+    def setUp(self) -> None:
+        get_notification_backend().clear()
+        self.book = sample_book()
+        self.users = [
+            create_user(email=f"user{i}@test.com", telegram_chat_id=f"chat-{i}")
+            for i in range(5)
+        ]
+        for user in self.users:
+            self.borrow(user, "2023-05-01")
+        self.borrow(self.users[0], "2023-05-10")
+        self.borrow(create_user(email="nochat@test.com"), "2023-05-01")
+        self.borrow(create_user(email="ontime@test.com", telegram_chat_id="ontime"), "2023-07-01")
+
+    def borrow(self, user, expected_return_date):
+        borrowing = sample_borrowing(self.book, user)
+        Borrowing.objects.filter(pk=borrowing.pk).update(expected_return_date=expected_return_date)
+
+    def test_users_are_split_into_ranges(self):
+        ranges = list(iter_user_ranges(TODAY, 2))
+
+        ids = [user.id for user in self.users]
+        self.assertEqual(ranges, [(ids[0], ids[1]), (ids[2], ids[3]), (ids[4], ids[4])])
+
+    def test_one_reminder_per_user(self):
+        stats = send_reminders(self.users[0].id, self.users[-1].id, TODAY)
+
+        outbox = get_notification_backend().outbox
+        self.assertEqual(stats, {"users": 5, "sent": 5, "failed": 0})
+        self.assertEqual([chat_id for chat_id, _ in outbox], [f"chat-{i}" for i in range(5)])
+        self.assertEqual(outbox[0][1].count("was due on"), 2)
+        self.assertEqual(ReminderLog.objects.filter(date=TODAY).count(), 5)
+
+    def test_users_are_reminded_once_a_day(self):
+        send_reminders(self.users[0].id, self.users[-1].id, TODAY)
+
+        stats = send_reminders(self.users[0].id, self.users[-1].id, TODAY)
+
+        self.assertEqual(stats["users"], 0)
+        self.assertEqual(len(get_notification_backend().outbox), 5)
+
+    def test_failed_reminders_are_retried(self):
+        backend = get_notification_backend()
+        with patch.object(backend, "deliver", side_effect=RuntimeError("telegram is down")):
+            stats = send_reminders(self.users[0].id, self.users[-1].id, TODAY)
+
+        self.assertEqual(stats["failed"], 5)
+        self.assertFalse(ReminderLog.objects.exists())
+        self.assertEqual(send_reminders(self.users[0].id, self.users[-1].id, TODAY)["sent"], 5)
+
+    def test_old_logs_are_purged(self):
+        ReminderLog.objects.create(user=self.users[0], date=date(2023, 5, 1))
+        ReminderLog.objects.create(user=self.users[0], date=TODAY)
+
+        self.assertEqual(purge_reminder_logs(TODAY), 1)
+
+    @override_settings(REMINDER_USERS_PER_RANGE=2, REMINDER_RANGES_PER_TASK=2)
+    @patch("borrowing.tasks.send_reminder_range.chunks")
+    def test_ranges_are_dispatched_in_chunks(self, mock_chunks):
+        self.assertEqual(send_overdue_reminders(), 3)
+
+        ranges, ranges_per_task = mock_chunks.call_args.args
+        self.assertEqual(len(ranges), 3)
+        self.assertEqual(ranges_per_task, 2)
+        mock_chunks.return_value.group.return_value.apply_async.assert_called_once()
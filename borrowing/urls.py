@@ -2,10 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
 
-from borrowing.views import BorrowingViewSet
+from borrowing.views import BorrowingViewSet, HoldViewSet
 
 router = routers.DefaultRouter()
 router.register("borrowings", BorrowingViewSet)
+router.register("holds", HoldViewSet)
 
 urlpatterns = [path("", include(router.urls))]
 
@@ -1,28 +1,50 @@
-from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 
-import stripe.error
-from django.db import transaction
+from django.conf import settings
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import mixins, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from borrowing.models import Borrowing
+from book.cache import get_catalog_version
+from book.inventory import reserve_copies, reserve_copy
+from borrowing.cache import get_borrowings_version, invalidate_borrowings
+from borrowing.holds import cancel_hold, fulfill_hold, hand_over_copy
+from borrowing.models import MONEY, ArchivedBorrowing, Borrowing, Hold
+from borrowing.pagination import BorrowingPagination
+from borrowing.returns import return_borrowings
 from borrowing.serializers import (
+    BorrowingBatchSerializer,
+    BorrowingBulkReturnSerializer,
     BorrowingSerializer,
     BorrowingListSerializer,
     BorrowingDetailSerializer,
+    BorrowingHistorySerializer,
     BorrowingReturnSerializer,
+    BorrowingTotalsSerializer,
+    HoldSerializer,
 )
+from library_team_project.conditional import ConditionalGetMixin
+from library_team_project.idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from library_team_project.query_budget import QueryBudgetMixin
 from payment.models import Payment
-from payment.views import create_checkout_session
+from borrowing.signals import notify_batch_borrowing
+from payment.tasks import schedule_checkout_session
 
 
 class BorrowingViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -34,17 +56,39 @@ class BorrowingViewSet(
     permission_classes = [
         IsAuthenticated,
     ]
+    pagination_class = BorrowingPagination
+    query_budgets = {
+        "list": 4,
+        "retrieve": 4,
+        "create": 11,
+        "borrow_batch": 10,
+        "return_book": 14,
+        "return_books": 10,
+        "totals": 2,
+        "history": 5,
+    }
+    cost_orderings = {
+        "price": ("price_amount", "id"),
+        "-price": ("-price_amount", "id"),
+    }
+    conditional_stamp_fields = (
+        "updated_at",
+        "book__updated_at",
+        "payments__updated_at",
+    )
 
     def get_queryset(self):
-        """Get the queryset for borrowings."""
+        """Get the queryset for borrowings, with their costs where they are shown."""
         queryset = self.queryset.select_related("book", "user").prefetch_related("payments")
+        if self.action in ("list", "retrieve", "totals"):
+            queryset = queryset.with_costs()
 
         if self.request.user.is_staff:
-            user_id = self.request.query_params.get("user_id")
+            user_id = self.get_user_id_param()
             is_active = self.request.query_params.get("is_active")
 
             if user_id:
-                queryset = queryset.filter(user_id=int(user_id))
+                queryset = queryset.filter(user_id=user_id)
 
             if is_active:
                 is_active = is_active.lower()
@@ -58,6 +102,71 @@ class BorrowingViewSet(
             return queryset
         return queryset.filter(user_id=self.request.user)
 
+    def get_user_id_param(self):
+        """Return the parsed ``?user_id=`` filter of staff requests."""
+        user_id = self.request.query_params.get("user_id")
+        if not user_id:
+            return None
+        try:
+            return int(user_id)
+        except ValueError:
+            raise ValidationError({"user_id": "A valid integer is required."})
+
+    def get_ordering_param(self):
+        """Return the ``?ordering=`` value for list requests, if it is supported."""
+        if self.action != "list":
+            return None
+        ordering = self.request.query_params.get("ordering")
+        return ordering if ordering in self.cost_orderings else None
+
+    def get_min_fine(self):
+        """Return the parsed ``?min_fine=`` of list and totals requests."""
+        if self.action not in ("list", "totals"):
+            return None
+        min_fine = self.request.query_params.get("min_fine")
+        if not min_fine:
+            return None
+        try:
+            return Decimal(min_fine)
+        except InvalidOperation:
+            raise ValidationError({"min_fine": "A valid number is required."})
+
+    def filter_queryset(self, queryset):
+        """Filter by the annotated fine when ``?min_fine=`` is given."""
+        queryset = super().filter_queryset(queryset)
+        min_fine = self.get_min_fine()
+        if min_fine is not None:
+            queryset = queryset.filter(fine_amount__gte=min_fine)
+        return queryset
+
+    def get_keyset_ordering(self):
+        """Order by the annotated price when requested, else by borrow date."""
+        ordering = self.get_ordering_param()
+        if ordering:
+            return self.cost_orderings[ordering]
+        return self.pagination_class.ordering
+
+    def get_conditional_version(self):
+        """Lists follow the user's borrowings version when the cache is shared."""
+        return get_borrowings_version(self.request.user)
+
+    def get_conditional_state(self):
+        """
+        Responses show books, so they also follow the catalog version.
+
+        Fines of unreturned borrowings grow every day without any stamp
+        moving, so the date is part of the state as well.
+        """
+        state = super().get_conditional_state()
+        if state is not None:
+            state["today"] = timezone.now().date()
+            state["catalog_version"] = get_catalog_version()
+        return state
+
+    def get_last_modified(self, state):
+        """Book inventory changes carry no stamp, so detail views rely on the ETag."""
+        return None
+
     def get_serializer_class(self):
         """Get the appropriate serializer class for the action."""
         if self.action == "list":
@@ -69,6 +178,18 @@ class BorrowingViewSet(
         if self.action == "return_book":
             return BorrowingReturnSerializer
 
+        if self.action == "borrow_batch":
+            return BorrowingBatchSerializer
+
+        if self.action == "return_books":
+            return BorrowingBulkReturnSerializer
+
+        if self.action == "totals":
+            return BorrowingTotalsSerializer
+
+        if self.action == "history":
+            return BorrowingHistorySerializer
+
         return self.serializer_class
 
     @action(
@@ -87,62 +208,214 @@ class BorrowingViewSet(
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if (payment_obj := borrowing.payments.filter(status=0)).exists():
-            return HttpResponseRedirect(payment_obj.first().session_url)
+        # Fines accrued while the book is out are settled on return.
+        if (payment_obj := borrowing.payments.filter(status=0, type=0).first()) is not None:
+            if payment_obj.session_url:
+                return HttpResponseRedirect(payment_obj.session_url)
+            self.regenerate_session(request, payment_obj)
+            return Response(
+                {
+                    "detail": "The payment session is being prepared, please try again shortly.",
+                    "payment": request.build_absolute_uri(
+                        reverse("payment:payment-detail", kwargs={"pk": payment_obj.id})
+                    ),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
 
         with transaction.atomic():
             borrowing.actual_return_date = timezone.now().date()
-            book = borrowing.book
-            book.inventory += 1
-
-            book.save()
             borrowing.save()
+            hand_over_copy(borrowing.book_id)
+
+        borrowing.book.refresh_from_db(fields=["inventory"])
 
         if borrowing.actual_return_date > borrowing.expected_return_date:
-            self.create_payment_for_borrowing(self.request, borrowing, borrowing.overdue, 1)
+            fine = borrowing.payments.filter(status=0, type=1).first()
+            if fine is None:
+                self.create_payment_for_borrowing(self.request, borrowing, borrowing.overdue, 1)
+            else:
+                # Finalize the fine accrued while the book was out; a session
+                # opened for an earlier amount is dropped.
+                if fine.money_to_pay != borrowing.overdue:
+                    fine.money_to_pay = borrowing.overdue
+                    fine.session_id = fine.session_url = ""
+                fine.save(update_fields=["money_to_pay", "session_id", "session_url", "updated_at"])
+                schedule_checkout_session(request, [fine])
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="return",
+        permission_classes=[IsAdminUser],
+    )
+    def return_books(self, request):
+        """Endpoint for returning many borrowings at once (staff only)"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = return_borrowings(request, serializer.validated_data["borrowings"])
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="batch",
+    )
+    @idempotent
+    def borrow_batch(self, request):
+        """Endpoint for borrowing several books with a single checkout session"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        books = serializer.validated_data["books"]
+        expected_return_date = serializer.validated_data["expected_return_date"]
+
+        with transaction.atomic():
+            if not reserve_copies([book.id for book in books]):
+                raise ValidationError(
+                    "Some of the books are out of stock and cannot be borrowed."
+                )
+            borrowings = Borrowing.objects.bulk_create([
+                Borrowing(
+                    book=book,
+                    user=request.user,
+                    expected_return_date=expected_return_date,
+                )
+                for book in books
+            ])
+            payments = self.create_payments_for_borrowings(request, borrowings)
+            invalidate_borrowings([request.user.id])
+
+        notify_batch_borrowing(borrowings)
+
+        return Response(
+            {
+                "borrowings": BorrowingSerializer(borrowings, many=True).data,
+                "payment": request.build_absolute_uri(
+                    reverse("payment:payment-detail", kwargs={"pk": payments[0].id})
+                ),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @staticmethod
+    def create_payments_for_borrowings(request, borrowings):
+        """Create pending payments for several borrowings, paid through one checkout session."""
+        payments = Payment.objects.bulk_create([
+            Payment(
+                status=0,
+                type=0,
+                borrowing=borrowing,
+                money_to_pay=borrowing.price,
+            )
+            for borrowing in borrowings
+        ])
+        schedule_checkout_session(request, payments)
+        return payments
+
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """Borrow a book; retries with the same ``Idempotency-Key`` are replayed."""
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Perform creation with transaction handling."""
-        try:
-            with transaction.atomic():
-                borrowing = serializer.save(user=self.request.user)
-
-                book = borrowing.book
-                book.inventory -= 1
-                book.save()
+        book_id = serializer.validated_data["book"].id
+        with transaction.atomic():
+            if not fulfill_hold(book_id, self.request.user) and not reserve_copy(book_id):
+                raise ValidationError(
+                    "Book is out of stock and cannot be borrowed."
+                )
+            borrowing = serializer.save(user=self.request.user)
 
-                self.create_payment_for_borrowing(self.request, borrowing, borrowing.price, 0)
+            self.create_payment_for_borrowing(self.request, borrowing, borrowing.price, 0)
 
-        except stripe.error.APIError:
-            borrowing.delete()
+    @staticmethod
+    def regenerate_session(request, payment):
+        """
+        Open a new session for a pending payment whose session expired.
+
+        A payment touched within ``PAYMENT_SESSION_RETRY_AFTER`` seconds is
+        still being handled, so repeated polling queues at most one task. The
+        key is derived from the payment as loaded, before the claim, so it
+        matches that of a first task still retrying and Stripe collapses them.
+        """
+        now = timezone.now()
+        claimed = Payment.objects.filter(
+            pk=payment.pk,
+            status=0,
+            session_id="",
+            updated_at__lte=now - timedelta(seconds=settings.PAYMENT_SESSION_RETRY_AFTER),
+        ).update(updated_at=now)
+        if claimed:
+            schedule_checkout_session(request, [payment])
 
     @staticmethod
     def create_payment_for_borrowing(request, borrowing: Borrowing, money: int, payment_type: int):
-        """Create payment for the borrowing."""
+        """
+        Create a pending payment for the borrowing.
 
+        The checkout session is opened by a worker after commit; clients
+        find its URL on the payment once it is ready.
+        """
         payment = Payment.objects.create(
             status=0,
             type=payment_type,
             borrowing=borrowing,
             money_to_pay=money,
         )
+        schedule_checkout_session(request, [payment])
+        return payment
 
-        base_url = request.build_absolute_uri(
-            reverse("payment:payment-detail", kwargs={"pk": payment.id})
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="totals",
+        permission_classes=[IsAdminUser],
+    )
+    def totals(self, request):
+        """Endpoint for the count, price and fine totals of borrowings (staff only)"""
+        totals = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            borrowings=Count("id"),
+            price=Coalesce(Sum("price_amount"), Value(0), output_field=MONEY),
+            fine=Coalesce(Sum("fine_amount"), Value(0), output_field=MONEY),
         )
+        return Response(BorrowingTotalsSerializer(totals).data, status=status.HTTP_200_OK)
 
-        money_to_pay = int(money * 100)
-
-        session_data = create_checkout_session(money_to_pay, base_url)
-
-        if session_data.get("error", None):
-            raise stripe.error.APIError
-
-        payment.session_url = session_data["session_url"]
-        payment.session_id = session_data["session_id"]
-        payment.save()
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="user_id",
+                description="Filter borrowings by user ID, staff only. (ex. ?user_id=1)",
+                type={"type": "number"},
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="history",
+    )
+    def history(self, request):
+        """Endpoint for every borrowing, archived ones included, oldest first"""
+        live = self.queryset.select_related("book", "user").prefetch_related("payments")
+        archived = ArchivedBorrowing.objects.select_related("book", "user").prefetch_related("payments")
+
+        user_id = request.user.id
+        if request.user.is_staff:
+            user_id = self.get_user_id_param()
+        if user_id:
+            live = live.filter(user_id=user_id)
+            archived = archived.filter(user_id=user_id)
+
+        page = self.paginate_queryset([live, archived])
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @extend_schema(
         parameters=[
@@ -156,8 +429,77 @@ class BorrowingViewSet(
                 description="Filter borrowings by active status. (ex. ?is_active=true)",
                 type={"type": "boolean"},
             ),
+            OpenApiParameter(
+                name="ordering",
+                description="Sort borrowings by price. (ex. ?ordering=price or ?ordering=-price)",
+                type={"type": "string"},
+                enum=["price", "-price"],
+            ),
+            OpenApiParameter(
+                name="min_fine",
+                description="Only borrowings with at least this fine, accrued so far for books still out. (ex. ?min_fine=10)",
+                type={"type": "number"},
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         """List all the borrowings."""
         return super().list(request, *args, **kwargs)
+
+
+class HoldViewSet(
+    QueryBudgetMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """
+    ViewSet for queueing for books that are out of stock.
+
+    A returned copy is reserved for the oldest waiting hold until
+    ``HOLD_READY_FOR`` seconds have passed, so patrons do not need to retry
+    borrowing until a copy shows up.
+    """
+    queryset = Hold.objects.all()
+    serializer_class = HoldSerializer
+    permission_classes = [IsAuthenticated]
+    query_budgets = {
+        "list": 2,
+        "retrieve": 2,
+        "create": 6,
+        "destroy": 6,
+    }
+
+    def get_queryset(self):
+        """Get the user's holds with their position in the queue."""
+        ahead = (
+            Hold.objects.filter(book=OuterRef("book"), status=Hold.WAITING, id__lte=OuterRef("id"))
+            .order_by()
+            .values("book")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return (
+            self.queryset.filter(user=self.request.user)
+            .select_related("book")
+            .annotate(position=Subquery(ahead))
+            .order_by("-id")
+        )
+
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError("You already hold this book.")
+
+    def destroy(self, request, *args, **kwargs):
+        """Cancel a hold; a copy reserved for it goes to the next one."""
+        if not cancel_hold(self.get_object()):
+            return Response(
+                {"detail": "Only waiting or ready holds can be cancelled."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+    Validators are derived from a cheap aggregate over the rows the action
+    would render (row count and the newest ``updated_at`` stamps), so an
+    unchanged resource is answered with 304 before the page is fetched or
+    serialized. Lists over large tables should return a cached version
+    from ``get_conditional_version`` instead, which costs no query.
+    """
+    conditional_actions = ("list", "retrieve")
+    conditional_stamp_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return queryset
+
+    def get_conditional_version(self):
+        """Return a version that moves whenever the list changes, or ``None`` to aggregate."""
+        return None
+
+    def get_conditional_state(self):
+        """
+        Return a fingerprint of what the action would render.
+
+        ``None`` disables validators, e.g. for a missing object so that the
+        regular 404 path runs.
+        """
+        if self.action == "list":
+            version = self.get_conditional_version()
+            if version is not None:
+                return {"version": version}
+        state = self.get_conditional_queryset().order_by().aggregate(
+            rows=Count("pk", distinct=True),
+            **{
+                f"stamp_{i}": Max(field)
+                for i, field in enumerate(self.conditional_stamp_fields)
+            },
+        )
+        if self.action == "retrieve" and not state["rows"]:
+            return None
+        return state
+
+    def get_last_modified(self, state):
+        """
+        Return the Last-Modified datetime for ``state``.
+
+        Only detail views get one: deleting a row from a list does not move
+        any stamp forward, so lists rely on the ETag alone.
+        """
+        if self.action != "retrieve":
+            return None
+        stamps = [
+            value for key, value in state.items()
+            if key.startswith("stamp_") and value is not None
+        ]
+        return max(stamps, default=None)
+
+    def get_etag(self, state):
+        fingerprint = json.dumps(
+            [self.request.user.pk, self.request.get_full_path(), state],
+            cls=DjangoJSONEncoder,
+            sort_keys=True,
+        )
+        return quote_etag(
+            hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest()
+        )
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        """Answer with 304 when the client's validators still match, else call ``handler``."""
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+
+        state = self.get_conditional_state()
+        if state is None:
+            return handler(request, *args, **kwargs)
+
+        etag = self.get_etag(state)
+        last_modified = self.get_last_modified(state)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
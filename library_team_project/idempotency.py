@@ -0,0 +1,114 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_CACHE_KEY = "idempotency:{user}:{key}"
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        "Unique key of this request. Retrying with the same key replays "
+        "the first response instead of repeating the request."
+    ),
+    type={"type": "string"},
+)
+
+
+def request_fingerprint(request) -> str:
+    return hashlib.sha256(
+        b"\n".join([request.method.encode(), request.path.encode(), request.body])
+    ).hexdigest()
+
+
+def idempotent(handler):
+    """
+    Make a view action replayable with an ``Idempotency-Key`` header.
+
+    The first response to a key is stored with ``IDEMPOTENCY_KEY_TTL`` and
+    returned again for retries of the same request, without running the
+    action. Reusing a key for a different request is rejected with 422, and
+    a retry that races the first request gets 409. Server errors are not
+    stored, so the client can retry them with the same key.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = IDEMPOTENCY_CACHE_KEY.format(user=request.user.pk, key=key)
+        fingerprint = request_fingerprint(request)
+        claimed = cache.add(
+            cache_key,
+            {"fingerprint": fingerprint, "state": IN_PROGRESS},
+            timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+        )
+        if not claimed:
+            return replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500 or getattr(response, "data", None) is None:
+            cache.delete(cache_key)
+        else:
+            cache.set(
+                cache_key,
+                {
+                    "fingerprint": fingerprint,
+                    "state": DONE,
+                    "status_code": response.status_code,
+                    "data": response.data,
+                    "location": response.get("Location"),
+                },
+                timeout=settings.IDEMPOTENCY_KEY_TTL,
+            )
+        return response
+
+    return wrapper
+
+
+def replay(record, fingerprint):
+    """Answer a repeated request from the stored ``record``."""
+    if record is None:
+        # The first request finished with a server error in the meantime.
+        return Response(
+            {"detail": "The original request failed, please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    if record["fingerprint"] != fingerprint:
+        return Response(
+            {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record["state"] == IN_PROGRESS:
+        return Response(
+            {"detail": "A request with this key is still being processed."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    headers = {"Idempotent-Replayed": "true"}
+    if record["location"]:
+        headers["Location"] = record["location"]
+    return Response(record["data"], status=record["status_code"], headers=headers)
@@ -0,0 +1,156 @@
+import heapq
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    DRF's ``CursorPagination`` only seeks on the first ordering field and
+    falls back to an offset for duplicates. Here the cursor stores the values
+    of every ordering field of the boundary row, and the next page is fetched
+    with a lexicographic ``(a, b, ...) > (x, y, ...)`` predicate, so every page
+    is a single index range scan no matter how deep it is.
+
+    The last ordering field must be unique (usually ``id``) and none of the
+    ordering fields may be NULL.
+    """
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = self.cursor.reverse, self.decode_position(self.cursor.position)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+        results = self.fetch_rows(querysets, ordering, position)
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def fetch_rows(self, querysets, ordering, position):
+        """
+        Fetch up to ``page_size + 1`` rows following ``position``.
+
+        Several querysets, e.g. over a live and an archive table, are each
+        read with the same seek predicate and merged, so a page still costs
+        one index range scan per table. Their IDs must not overlap.
+        """
+        parts = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self.get_seek_filter(ordering, position))
+            parts.append(list(queryset[:self.page_size + 1]))
+        if len(parts) == 1:
+            return parts[0]
+
+        descending = {field.startswith("-") for field in ordering}
+        assert len(descending) == 1, (
+            "Merging querysets needs every ordering field in the same direction."
+        )
+        fields = [field.lstrip("-") for field in ordering]
+        merged = heapq.merge(
+            *parts,
+            key=lambda row: [getattr(row, field) for field in fields],
+            reverse=descending.pop(),
+        )
+        return list(islice(merged, self.page_size + 1))
+
+    def get_ordering(self, request, queryset, view):
+        """Return the view's keyset ordering, or the one of this class."""
+        if hasattr(view, "get_keyset_ordering"):
+            ordering = view.get_keyset_ordering()
+        else:
+            ordering = self.ordering
+        assert ordering[-1].lstrip("-") in ("id", "pk"), (
+            "Keyset pagination needs a unique tiebreaker as the last ordering field."
+        )
+        return tuple(ordering)
+
+    @staticmethod
+    def get_seek_filter(ordering, position):
+        """Build the predicate selecting rows strictly after ``position``."""
+        seek = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            seek |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        # The redundant bound on the leading column lets the planner
+        # turn the OR chain into a single index range scan.
+        first = ordering[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{bound}": position[0]}) & seek
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=self.encode_position(self.page[-1]),
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True, position=self.encode_position(self.page[0]),
+        ))
+
+    def encode_position(self, instance):
+        """Serialize the ordering values of ``instance`` into a cursor position."""
+        return json.dumps(
+            [getattr(instance, field.lstrip("-")) for field in self.ordering],
+            cls=DjangoJSONEncoder,
+            separators=(",", ":"),
+        )
+
+    def decode_position(self, position):
+        if position is None:
+            return None
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith("-") else f"-{field}"
+        for field in ordering
+    )
@@ -0,0 +1,75 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudgetMixin:
+    """
+    Declare how many queries each action of a view may run.
+
+    ``query_budgets`` maps action names, or lowercased HTTP methods for
+    views without actions, to the most queries a request may run, counted
+    from the first middleware on. A budget is a constant: it must hold
+    however many rows the response covers, so an N+1 breaks it as soon as
+    a test renders two rows. Requests are checked by ``QueryBudgetMiddleware``.
+    """
+    query_budgets = {}
+
+    def get_query_budget(self, request):
+        return self.query_budgets.get(getattr(self, "action", None) or request.method.lower())
+
+    def initial(self, request, *args, **kwargs):
+        request._request.query_budget = self.get_query_budget(request)
+        super().initial(request, *args, **kwargs)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the queries of each request and compare them to its view's budget.
+
+    A request over budget is logged as a warning; with
+    ``QUERY_BUDGET_STRICT``, which the test runner turns on, it raises
+    ``QueryBudgetExceeded`` so the regression fails the test that made it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and counter.count > budget:
+            message = "%s %s ran %d queries, over its budget of %d." % (
+                request.method, request.path, counter.count, budget
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Test runner that fails requests running more queries than budgeted."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
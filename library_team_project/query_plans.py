@@ -0,0 +1,43 @@
+import json
+import re
+
+from django.db import connections
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?P<table>\w+)(?P<index> USING (COVERING )?INDEX)?")
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _walk(child)
+
+
+def sequential_scans(queryset, tables=None) -> list:
+    """
+    Return the tables the plan of ``queryset`` reads with a sequential scan.
+
+    The plan comes from ``EXPLAIN`` on the queryset's database; Postgres and
+    SQLite plans are understood. Pass ``tables`` to only report those, e.g.
+    the ones too large to be scanned on a hot path.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        plan = json.loads(queryset.explain(format="json"))[0]["Plan"]
+        scanned = [node["Relation Name"] for node in _walk(plan) if node["Node Type"] == "Seq Scan"]
+    elif connection.vendor == "sqlite":
+        scanned = [
+            match["table"]
+            for match in SQLITE_SCAN.finditer(queryset.explain())
+            if not match["index"]
+        ]
+    else:
+        raise NotImplementedError(f"Plans of {connection.vendor} are not supported.")
+    return [table for table in scanned if tables is None or table in tables]
+
+
+def analyze(*models, using="default"):
+    """Refresh planner statistics for the tables of ``models``."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
@@ -13,6 +13,8 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "debug_toolbar",
     "rest_framework",
     "rest_framework_simplejwt",
@@ -59,6 +62,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "library_team_project.query_budget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -71,6 +75,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "library_team_project.urls"
 
+TEST_RUNNER = "library_team_project.query_budget.QueryBudgetTestRunner"
+
+# Requests over their view's query budget are logged; tests raise instead.
+QUERY_BUDGET_STRICT = False
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -186,9 +195,114 @@ REST_FRAMEWORK = {
 
 STRIPE_PUBLISHABLE_KEY = os.environ["STRIPE_PUBLISHABLE_KEY"]
 STRIPE_SECRET_KEY = os.environ["STRIPE_SECRET_KEY"]
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+STRIPE_EVENT_BATCH_SIZE = 500
+
+# Used to build checkout return URLs outside of a request.
+SITE_URL = os.getenv("SITE_URL")
+if not SITE_URL:
+    if not DEBUG:
+        raise ImproperlyConfigured("SITE_URL must be set when DEBUG is off.")
+    SITE_URL = "http://127.0.0.1:8000"
+
+PAYMENT_SESSION_RETRY_AFTER = 60
+PAYMENT_RECONCILE_CHUNK_SIZE = 500
+PAYMENT_RECONCILE_WORKERS = 8
+PAYMENT_RECONCILE_MIN_AGE = 60 * 60
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+PAYMENT_GATEWAY = {
+    "BACKEND": os.getenv("PAYMENT_GATEWAY_BACKEND", "payment.gateway.StripeGateway"),
+    "OPTIONS": {},
+}
+
+PAYMENT_SESSION_MAX_RETRIES = 5
+
+OVERDUE_SCAN_CHUNK_SIZE = 2000
+NOTIFICATION_MAX_WORKERS = 4
+
+TELEGRAM_CONNECT_TIMEOUT = 3.05
+TELEGRAM_READ_TIMEOUT = 10
+TELEGRAM_POOL_SIZE = NOTIFICATION_MAX_WORKERS
+
+NOTIFICATION_BACKEND = {
+    "BACKEND": os.getenv("NOTIFICATION_BACKEND", "telegram"),
+    "OPTIONS": {},
+}
+NOTIFICATION_BATCH_SIZE = 100
+
+NOTIFICATION_QUEUE = {
+    "BACKEND": os.getenv(
+        "NOTIFICATION_QUEUE_BACKEND", "borrowing.notifications.CeleryNotificationQueue"
+    ),
+}
+NOTIFICATION_COALESCE_WINDOW = 3
+NOTIFICATION_MESSAGES_PER_FLUSH = 1
+NOTIFICATION_BUFFER_TTL = 24 * 60 * 60
+# Outlives a flush stuck on Telegram, so a killed worker blocks a chat briefly.
+NOTIFICATION_FLUSH_LOCK_TIMEOUT = 3 * TELEGRAM_READ_TIMEOUT
+
+REMINDER_USERS_PER_RANGE = 1000
+REMINDER_RANGES_PER_TASK = 10
+REMINDER_LOG_RETENTION_DAYS = 7
+
+FINE_ACCRUAL_CHUNK_SIZE = 1000
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_BATCH_PAUSE = 0.5
+ARCHIVE_MAX_BATCHES = None
+
+HOLD_READY_FOR = 48 * 60 * 60
+HOLD_SWEEP_BATCH_SIZE = 500
+
+if os.getenv("REDIS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_CACHE_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+BOOK_CACHE_TIMEOUT = 15 * 60
+INVENTORY_ROLLUP_TTL = 5
 
 CELERY_BROKER_URL = "redis://redis:6379"
 CELERY_RESULT_BACKEND = "redis://redis:6379"
 CELERY_TIMEZONE = "Europe/Kyiv"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-pending-payments": {
+        "task": "payment.tasks.reconcile_payments",
+        "schedule": 15 * 60,
+    },
+    "send-overdue-reminders": {
+        "task": "borrowing.tasks.send_overdue_reminders",
+        "schedule": crontab(hour=9, minute=0),
+    },
+    "accrue-overdue-fines": {
+        "task": "borrowing.tasks.accrue_overdue_fines",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    "expire-holds": {
+        "task": "borrowing.tasks.expire_holds",
+        "schedule": 10 * 60,
+    },
+    "refresh-inventory-rollups": {
+        "task": "book.tasks.refresh_inventory",
+        "schedule": 60,
+    },
+    "archive-returned-borrowings": {
+        "task": "borrowing.tasks.archive_returned_borrowings",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from book.models import Book
+from borrowing.models import Borrowing, Hold
+from borrowing.tests.samples import sample_book, sample_borrowing
+from library_team_project.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware
+from payment.tests.samples import sample_payment
+
+
+def view_running(queries, budget):
+    def get_response(request):
+        request.query_budget = budget
+        for _ in range(queries):
+            Book.objects.exists()
+        return HttpResponse()
+
+    return QueryBudgetMiddleware(get_response)
+
+
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self) -> None:
+        self.request = RequestFactory().get("/api/books/")
+
+    def test_request_within_budget_passes(self):
+        with self.assertNoLogs("library_team_project.query_budget"):
+            view_running(2, budget=2)(self.request)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_request_over_budget_is_logged(self):
+        with self.assertLogs("library_team_project.query_budget", "WARNING") as logs:
+            response = view_running(3, budget=2)(self.request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("GET /api/books/ ran 3 queries, over its budget of 2.", logs.output[0])
+
+    def test_request_over_budget_fails_in_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            view_running(3, budget=2)(self.request)
+
+    def test_views_without_budget_are_not_checked(self):
+        with self.assertNoLogs("library_team_project.query_budget"):
+            view_running(3, budget=None)(self.request)
+
+
+class QueryBudgetScaleTest(TestCase):
+    """Budgeted endpoints run as many queries for many rows as for one."""
+
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(email="reader@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.borrowing = self.add_rows()
+
+    def add_rows(self):
+        book = sample_book(title=f"Book {Book.objects.count()}")
+        borrowing = sample_borrowing(book, self.user, actual_return_date="2090-01-01")
+        sample_payment(borrowing, status=1)
+        sample_payment(borrowing, status=1, type=1)
+        Hold.objects.create(book=book, user=self.user)
+        return borrowing
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_listings_do_not_grow_with_rows(self):
+        urls = [
+            reverse("book:book-list"),
+            reverse("borrowing:borrowing-list"),
+            reverse("borrowing:borrowing-history"),
+            reverse("borrowing:hold-list"),
+            reverse("payment:payment-list"),
+        ]
+        counts = [self.count_queries(url) for url in urls]
+        for _ in range(4):
+            self.add_rows()
+
+        self.assertEqual([self.count_queries(url) for url in urls], counts)
+
+    def test_detail_does_not_grow_with_payments(self):
+        url = reverse("borrowing:borrowing-detail", args=[self.borrowing.id])
+        count = self.count_queries(url)
+        for _ in range(4):
+            sample_payment(self.borrowing, status=1)
+        Borrowing.objects.filter(pk=self.borrowing.pk).update(actual_return_date="2090-01-02")
+
+        self.assertEqual(self.count_queries(url), count)
@@ -0,0 +1,66 @@
+"""
+Local stand-in for Stripe's webhook sender.
+
+Builds checkout session events and signs them the way Stripe does, so the
+webhook endpoint can be exercised and benchmarked without network access.
+"""
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+
+from payment.webhooks import SESSION_COMPLETED, SESSION_EXPIRED
+
+
+def build_event(event_type, session_id, payment_status="paid"):
+    """Build a minimal Stripe event for a checkout session."""
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": payment_status,
+            },
+        },
+    }
+
+
+def sign_payload(payload: str, secret: str, timestamp=None) -> str:
+    """Return a ``Stripe-Signature`` header value for ``payload``."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def generate_events(session_ids, expired_rate=0.1, duplicate_rate=0.05, seed=None):
+    """
+    Yield events for ``session_ids`` in random order.
+
+    A share of the sessions expire instead of completing, and a share of
+    the events is delivered twice, like Stripe's at-least-once delivery.
+    """
+    rng = random.Random(seed)
+    events = [
+        build_event(
+            SESSION_EXPIRED if rng.random() < expired_rate else SESSION_COMPLETED,
+            session_id,
+        )
+        for session_id in session_ids
+    ]
+    events.extend(rng.sample(events, int(len(events) * duplicate_rate)))
+    rng.shuffle(events)
+    return events
+
+
+def signed_request(event, secret):
+    """Return ``(body, signature_header)`` ready to POST to the webhook."""
+    body = json.dumps(event)
+    return body, sign_payload(body, secret)
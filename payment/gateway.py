@@ -0,0 +1,286 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from stripe.api_requestor import APIRequestor
+from stripe.http_client import RequestsClient
+
+
+class PaymentGatewayError(Exception):
+    """The payment provider rejected a call."""
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """The payment provider could not be reached; the call may be retried."""
+
+
+class CircuitOpenError(PaymentGatewayUnavailable):
+    """Calls are refused while the provider is failing."""
+
+    def __init__(self, message="Payment provider is unavailable, try again later."):
+        super().__init__(message)
+
+
+class CircuitBreaker:
+    """
+    Fail fast after ``failure_threshold`` consecutive failures.
+
+    Once ``reset_timeout`` seconds have passed, one trial call is let
+    through; its outcome closes the circuit again or keeps it open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or self.clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+
+class PaymentGateway:
+    """Interface of the payment provider used by the payment app."""
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, idempotency_key=None):
+        """Open a checkout session; return ``{"session_id", "session_url"}``."""
+        raise NotImplementedError
+
+    def retrieve_session(self, session_id):
+        """Return ``{"id", "status", "payment_status", "url"}`` of a session."""
+        raise NotImplementedError
+
+    def retrieve_sessions(self, session_ids, max_workers=8):
+        """
+        Retrieve many sessions concurrently over the pooled client.
+
+        Returns ``(states, failed)``: session states by ID and the IDs that
+        could not be retrieved. ``CircuitOpenError`` is raised as soon as the
+        circuit opens, since the remaining calls would fail anyway.
+        """
+        states, failed = {}, []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.retrieve_session, session_id): session_id
+                for session_id in session_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    states[futures[future]] = future.result()
+                except CircuitOpenError:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                except PaymentGatewayError:
+                    failed.append(futures[future])
+        return states, failed
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Stripe Checkout over one pooled HTTP session per process.
+
+    Every attempt is bounded by connect/read timeouts and the retries of a
+    call by ``deadline`` seconds. Only idempotent calls are retried: reads,
+    and session creation, which always carries an ``Idempotency-Key``.
+    """
+
+    RETRYABLE_ERRORS = (
+        stripe.error.APIConnectionError,
+        stripe.error.APIError,
+        stripe.error.RateLimitError,
+    )
+
+    def __init__(
+        self,
+        api_key=None,
+        connect_timeout=3.05,
+        read_timeout=10.0,
+        deadline=20.0,
+        max_retries=3,
+        backoff=0.5,
+        pool_size=10,
+        failure_threshold=5,
+        reset_timeout=30.0,
+    ):
+        self.api_key = api_key or settings.STRIPE_SECRET_KEY
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size
+        )
+        session.mount("https://", adapter)
+        self.http_client = RequestsClient(
+            timeout=(connect_timeout, read_timeout), session=session
+        )
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, idempotency_key=None):
+        session = self._call(
+            "post",
+            "/v1/checkout/sessions",
+            {
+                "success_url": success_url,
+                "cancel_url": cancel_url,
+                "payment_method_types": ["card"],
+                "mode": "payment",
+                "line_items": line_items,
+            },
+            headers={"Idempotency-Key": idempotency_key or str(uuid.uuid4())},
+        )
+        return {"session_id": session["id"], "session_url": session["url"]}
+
+    def retrieve_session(self, session_id):
+        session = self._call("get", f"/v1/checkout/sessions/{session_id}")
+        return {
+            "id": session["id"],
+            "status": session["status"],
+            "payment_status": session["payment_status"],
+            "url": session.get("url"),
+        }
+
+    def _call(self, method, url, params=None, headers=None):
+        requestor = APIRequestor(key=self.api_key, client=self.http_client)
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError()
+            try:
+                response, _ = requestor.request(method, url, params, headers)
+            except self.RETRYABLE_ERRORS as error:
+                self.breaker.record_failure()
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline_at:
+                    raise PaymentGatewayUnavailable(str(error)) from error
+                time.sleep(delay)
+            except stripe.error.StripeError as error:
+                # The request itself was rejected; Stripe is healthy.
+                self.breaker.record_success()
+                raise PaymentGatewayError(str(error)) from error
+            else:
+                self.breaker.record_success()
+                return response.data
+
+
+class LocalGateway(PaymentGateway):
+    """
+    In-process stand-in for Stripe used in tests and load runs.
+
+    Sessions live in memory. ``latency`` and ``failure_rate`` simulate a
+    slow or flaky provider.
+    """
+
+    def __init__(self, base_url="https://checkout.local/pay/", latency=0.0, failure_rate=0.0):
+        self.base_url = base_url
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._lock = threading.Lock()
+        self.sessions = {}
+        self._idempotency_keys = {}
+
+    def create_checkout_session(self, line_items, success_url, cancel_url, idempotency_key=None):
+        self._simulate()
+        with self._lock:
+            if idempotency_key in self._idempotency_keys:
+                session = self.sessions[self._idempotency_keys[idempotency_key]]
+            else:
+                session_id = f"cs_local_{uuid.uuid4().hex}"
+                session = {
+                    "id": session_id,
+                    "status": "open",
+                    "payment_status": "unpaid",
+                    "url": f"{self.base_url}{session_id}",
+                    "line_items": line_items,
+                    "success_url": success_url,
+                    "cancel_url": cancel_url,
+                }
+                self.sessions[session_id] = session
+                if idempotency_key is not None:
+                    self._idempotency_keys[idempotency_key] = session_id
+        return {"session_id": session["id"], "session_url": session["url"]}
+
+    def retrieve_session(self, session_id):
+        self._simulate()
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise PaymentGatewayError(f"No such checkout session: '{session_id}'")
+        return {
+            "id": session["id"],
+            "status": session["status"],
+            "payment_status": session["payment_status"],
+            "url": session["url"] if session["status"] == "open" else None,
+        }
+
+    def complete(self, session_id):
+        """Mark a session as paid, as if the customer finished checkout."""
+        self.sessions[session_id].update(status="complete", payment_status="paid")
+
+    def expire(self, session_id):
+        self.sessions[session_id].update(status="expired")
+
+    def _simulate(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise PaymentGatewayUnavailable("Simulated provider failure.")
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> PaymentGateway:
+    """Return the process-wide gateway configured by ``PAYMENT_GATEWAY``."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                config = settings.PAYMENT_GATEWAY
+                _gateway = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting=None, **kwargs):
+    global _gateway
+    if setting in (None, "PAYMENT_GATEWAY", "STRIPE_SECRET_KEY"):
+        _gateway = None
@@ -0,0 +1,112 @@
+import secrets
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.fake_stripe import generate_events, signed_request
+from payment.models import Payment, StripeEvent
+from payment.views import stripe_webhook
+from payment.webhooks import apply_pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Stripe webhook ingestion and processing offline with "
+        "locally signed fake events. All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=2000)
+        parser.add_argument("--expired-rate", type=float, default=0.1)
+        parser.add_argument("--duplicate-rate", type=float, default=0.05)
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        secret = f"whsec_{secrets.token_hex(16)}"
+        with override_settings(STRIPE_WEBHOOK_SECRET=secret), transaction.atomic():
+            session_ids = self.create_payments(options["payments"])
+            events = generate_events(
+                session_ids,
+                expired_rate=options["expired_rate"],
+                duplicate_rate=options["duplicate_rate"],
+                seed=options["seed"],
+            )
+            requests = [signed_request(event, secret) for event in events]
+
+            factory = RequestFactory()
+            url = reverse("payment:stripe-webhook")
+            started = time.perf_counter()
+            for body, signature in requests:
+                response = stripe_webhook(
+                    factory.post(
+                        url,
+                        data=body,
+                        content_type="application/json",
+                        HTTP_STRIPE_SIGNATURE=signature,
+                    )
+                )
+                assert response.status_code == 200, response.data
+            ingest = time.perf_counter() - started
+            stored = StripeEvent.objects.count()
+
+            started = time.perf_counter()
+            stats = apply_pending_events(batch_size=options["batch_size"], notify=False)
+            apply = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Received {len(requests)} events, stored {stored} "
+            f"({len(requests) - stored} duplicates dropped)."
+        )
+        self.stdout.write(
+            f"Ingest: {ingest:.3f}s ({len(requests) / ingest:.0f} events/s)"
+        )
+        self.stdout.write(
+            f"Apply: {apply:.3f}s ({stats['events'] / apply:.0f} events/s), "
+            f"{stats['paid']} paid, {stats['expired']} expired"
+        )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished, all data rolled back."))
+
+    @staticmethod
+    def create_payments(count):
+        """Create pending payments with fake session IDs, without signals."""
+        user = get_user_model().objects.create_user(
+            email=f"benchmark-{secrets.token_hex(4)}@example.com"
+        )
+        book = Book.objects.create(
+            title=f"Benchmark {secrets.token_hex(4)}",
+            author="Benchmark",
+            cover="hard",
+            inventory=count,
+            daily_fee="1.00",
+        )
+        borrowings = Borrowing.objects.bulk_create([
+            Borrowing(
+                book=book,
+                user=user,
+                borrow_date=timezone.now().date(),
+                expected_return_date=timezone.now().date() + timedelta(days=7),
+            )
+            for _ in range(count)
+        ])
+        session_ids = [f"cs_bench_{i}" for i in range(count)]
+        Payment.objects.bulk_create([
+            Payment(
+                borrowing=borrowing,
+                money_to_pay="7.00",
+                session_url=f"https://checkout.example.com/{session_id}",
+                session_id=session_id,
+            )
+            for borrowing, session_id in zip(borrowings, session_ids)
+        ])
+        return session_ids
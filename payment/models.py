@@ -1,6 +1,6 @@
 from django.db import models
 
-from borrowing.models import Borrowing
+from borrowing.models import ArchivedBorrowing, Borrowing
 
 
 class Payment(models.Model):
@@ -23,13 +23,59 @@ class Payment(models.Model):
     )
 
     borrowing = models.ForeignKey(
-        Borrowing, on_delete=models.CASCADE, related_name="payments"
+        Borrowing,
+        on_delete=models.CASCADE,
+        related_name="payments",
+        # Covered by the (borrowing, status) index.
+        db_index=False,
     )
 
     session_url = models.CharField(max_length=512)
     session_id = models.CharField(max_length=255)
 
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["borrowing", "status"]),
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["session_id"]),
+        ]
 
     def __str__(self):
         return f"Payment: {self.id}; Pay: {self.money_to_pay};"
+
+
+class ArchivedPayment(models.Model):
+    """A settled payment moved to the archive together with its borrowing."""
+    id = models.BigIntegerField(primary_key=True)
+    status = models.IntegerField(choices=Payment.STATUS_CHOICES)
+    type = models.IntegerField(choices=Payment.TYPE_CHOICES)
+    borrowing = models.ForeignKey(
+        ArchivedBorrowing, on_delete=models.CASCADE, related_name="payments"
+    )
+    session_url = models.CharField(max_length=512)
+    session_id = models.CharField(max_length=255)
+    money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived payment: {self.id}; Pay: {self.money_to_pay};"
+
+
+class StripeEvent(models.Model):
+    """Stripe webhook event, stored once per event ID until it is applied."""
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=255)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at", "id"]),
+        ]
+
+    def __str__(self):
+        return f"Stripe event: {self.event_id}; Type: {self.type};"
@@ -0,0 +1,77 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from payment.gateway import CircuitOpenError, get_gateway
+from payment.models import Payment
+from payment.webhooks import apply_session_states
+
+logger = logging.getLogger(__name__)
+
+
+def iter_pending_pages(chunk_size, updated_before):
+    """
+    Yield pending payments with a session as ``(id, session_id)`` pages.
+
+    Pages are read by keyset on the primary key, so each query is an index
+    range scan and memory stays bounded however many rows are pending.
+    """
+    last_id = 0
+    while True:
+        page = list(
+            Payment.objects.filter(status=0, id__gt=last_id, updated_at__lte=updated_before)
+            .exclude(session_id="")
+            .order_by("id")
+            .values_list("id", "session_id")[:chunk_size]
+        )
+        if not page:
+            return
+        yield page
+        last_id = page[-1][0]
+
+
+def reconcile_pending_payments(chunk_size=None, max_workers=None, min_age=None):
+    """
+    Bring pending payments in line with the state of their Stripe sessions.
+
+    Payments whose session was paid are marked as paid and expired sessions
+    are cleared; a new one is opened when the borrower next needs it.
+    Payments updated within ``min_age`` seconds are left to the webhook.
+    Returns statistics of the run.
+    """
+    chunk_size = chunk_size or settings.PAYMENT_RECONCILE_CHUNK_SIZE
+    max_workers = max_workers or settings.PAYMENT_RECONCILE_WORKERS
+    min_age = settings.PAYMENT_RECONCILE_MIN_AGE if min_age is None else min_age
+    updated_before = timezone.now() - timedelta(seconds=min_age)
+    gateway = get_gateway()
+    stats = {"pages": 0, "scanned": 0, "sessions": 0, "paid": 0, "expired": 0, "failed": 0}
+    started = time.perf_counter()
+
+    for page in iter_pending_pages(chunk_size, updated_before):
+        stats["pages"] += 1
+        stats["scanned"] += len(page)
+        session_ids = {session_id for _, session_id in page}
+        stats["sessions"] += len(session_ids)
+        try:
+            states, failed = gateway.retrieve_sessions(session_ids, max_workers=max_workers)
+        except CircuitOpenError:
+            logger.warning("Payment reconciliation stopped, the gateway circuit is open.")
+            stats["aborted"] = True
+            break
+        stats["failed"] += len(failed)
+
+        with transaction.atomic():
+            applied = apply_session_states(
+                {session_id for session_id, state in states.items() if state["payment_status"] == "paid"},
+                {session_id for session_id, state in states.items() if state["status"] == "expired"},
+            )
+        stats["paid"] += applied["paid"]
+        stats["expired"] += applied["expired"]
+
+    stats["duration"] = round(time.perf_counter() - started, 4)
+    logger.info("Payment reconciliation finished: %s", stats)
+    return stats
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from payment.gateway import PaymentGatewayError, PaymentGatewayUnavailable
+from payment.models import Payment
+from payment.reconciliation import reconcile_pending_payments
+from payment.views import build_line_item, create_checkout_session
+from payment.webhooks import apply_pending_events
+
+logger = logging.getLogger(__name__)
+
+
+def checkout_idempotency_key(payments, base_url) -> str:
+    """
+    Derive the Stripe idempotency key of a session for ``payments``.
+
+    It depends only on the payments, their ``updated_at`` stamps and the
+    base of the return URLs, so task retries, a regenerated session racing
+    them and reconciliation all get the same session back instead of
+    opening another one. Stripe rejects a key reused with other parameters,
+    hence the URL.
+    """
+    stamps = ",".join(f"{payment.id}:{payment.updated_at.isoformat()}" for payment in payments)
+    return hashlib.sha256(f"checkout:{base_url}:{stamps}".encode()).hexdigest()
+
+
+def schedule_checkout_session(request, payments):
+    """
+    Queue one checkout session for ``payments`` once the transaction commits.
+
+    The pending ``Payment`` rows act as the outbox: they are written in the
+    same transaction as the borrowing, and the Stripe call happens in a
+    worker after commit, so no row lock is held across the network.
+
+    The Stripe idempotency key is fixed here from the payments' state; see
+    ``checkout_idempotency_key``.
+    """
+    payment_ids = [payment.id for payment in payments]
+    base_url = request.build_absolute_uri(
+        reverse("payment:payment-detail", kwargs={"pk": payment_ids[0]})
+    )
+    idempotency_key = checkout_idempotency_key(payments, base_url)
+    transaction.on_commit(
+        lambda: open_checkout_session.delay(payment_ids, base_url, idempotency_key),
+        robust=True,
+    )
+
+
+@shared_task(
+    autoretry_for=(PaymentGatewayUnavailable,),
+    retry_backoff=True,
+    retry_jitter=True,
+    max_retries=settings.PAYMENT_SESSION_MAX_RETRIES,
+)
+def open_checkout_session(payment_ids, base_url, idempotency_key=None):
+    """
+    Open a Stripe checkout session for pending payments without one.
+
+    Payments that were paid, or already got a session from an earlier
+    attempt, are skipped, so redelivered tasks are harmless. Only an
+    unreachable provider is retried; rejected calls are logged.
+    """
+    payments = list(
+        Payment.objects.filter(pk__in=payment_ids, status=0, session_id="")
+        .select_related("borrowing__book")
+        .order_by("id")
+    )
+    if not payments:
+        return None
+
+    line_items = [
+        build_line_item(
+            int(payment.money_to_pay * 100),
+            name=payment.borrowing.book.title,
+            description="Overdue fine" if payment.type == 1 else "Book borrowing",
+        )
+        for payment in payments
+    ]
+    try:
+        session_data = create_checkout_session(
+            None, base_url, line_items=line_items, idempotency_key=idempotency_key
+        )
+    except PaymentGatewayError as error:
+        logger.warning("Checkout session for payments %s failed: %s", payment_ids, error)
+        raise
+
+    Payment.objects.filter(pk__in=[payment.id for payment in payments]).update(
+        session_url=session_data["session_url"],
+        session_id=session_data["session_id"],
+        updated_at=timezone.now(),
+    )
+    return session_data["session_id"]
+
+
+@shared_task
+def apply_stripe_events():
+    """Apply stored Stripe webhook events; concurrent runs split the backlog."""
+    return apply_pending_events()
+
+
+def reopen_checkout_sessions(chunk_size=None):
+    """
+    Queue a checkout session for each pending payment left without one.
+
+    A task lost by the broker after commit, or an expired session, leaves a
+    pending payment with no URL, which blocks new borrowings. Payments not
+    touched for ``PAYMENT_SESSION_RETRY_AFTER`` seconds are queued again.
+    The idempotency key follows the payment's ``updated_at``, so repeated
+    runs, and a task still retrying, do not open a second session. Returns
+    the number of payments queued.
+    """
+    chunk_size = chunk_size or settings.PAYMENT_RECONCILE_CHUNK_SIZE
+    updated_before = timezone.now() - timedelta(seconds=settings.PAYMENT_SESSION_RETRY_AFTER)
+    queued, last_id = 0, 0
+    while True:
+        page = list(
+            Payment.objects.filter(status=0, session_id="", id__gt=last_id, updated_at__lte=updated_before)
+            # Fines still accruing get their session when the book is returned.
+            .exclude(type=1, borrowing__actual_return_date__isnull=True)
+            .order_by("id")
+            .only("id", "updated_at")[:chunk_size]
+        )
+        if not page:
+            return queued
+        for payment in page:
+            base_url = settings.SITE_URL + reverse("payment:payment-detail", kwargs={"pk": payment.id})
+            open_checkout_session.delay([payment.id], base_url, checkout_idempotency_key([payment], base_url))
+        queued += len(page)
+        last_id = page[-1].id
+
+
+@shared_task
+def reconcile_payments():
+    """Periodically reconcile pending payments with Stripe and reopen lost sessions."""
+    stats = reconcile_pending_payments()
+    stats["reopened"] = reopen_checkout_sessions()
+    return stats
@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+import stripe
+from django.test import SimpleTestCase, override_settings
+
+from payment.gateway import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LocalGateway,
+    PaymentGatewayError,
+    PaymentGatewayUnavailable,
+    StripeGateway,
+    get_gateway,
+)
+
+REQUEST = "payment.gateway.APIRequestor.request"
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+SESSION = (FakeResponse({"id": "cs_1", "url": "https://pay"}), "sk_test")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: self.now)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+    def test_lets_one_trial_through_after_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 11
+
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+
+
+class StripeGatewayTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.gateway = StripeGateway(api_key="sk_test", backoff=0, failure_threshold=3)
+
+    def create_session(self, **kwargs):
+        return self.gateway.create_checkout_session(
+            [], "https://app/success/", "https://app/cancelled/", **kwargs
+        )
+
+    def test_retries_connection_errors_with_same_idempotency_key(self):
+        with patch(REQUEST, side_effect=[stripe.error.APIConnectionError("reset"), SESSION]) as mock_request:
+            session = self.create_session(idempotency_key="key-1")
+
+        self.assertEqual(session, {"session_id": "cs_1", "session_url": "https://pay"})
+        self.assertEqual(mock_request.call_count, 2)
+        for call in mock_request.call_args_list:
+            self.assertEqual(call.args[3], {"Idempotency-Key": "key-1"})
+
+    def test_rejected_request_is_not_retried(self):
+        with patch(REQUEST, side_effect=stripe.error.InvalidRequestError("bad", "line_items")) as mock_request:
+            with self.assertRaises(PaymentGatewayError) as context:
+                self.create_session()
+
+        self.assertNotIsInstance(context.exception, PaymentGatewayUnavailable)
+        mock_request.assert_called_once()
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.gateway.max_retries = 0
+        with patch(REQUEST, side_effect=stripe.error.APIError("down")) as mock_request:
+            for _ in range(3):
+                with self.assertRaises(PaymentGatewayUnavailable):
+                    self.create_session()
+            with self.assertRaises(CircuitOpenError):
+                self.create_session()
+
+        self.assertEqual(mock_request.call_count, 3)
+
+
+class LocalGatewayTests(SimpleTestCase):
+    def test_idempotency_key_returns_same_session(self):
+        gateway = LocalGateway()
+        first = gateway.create_checkout_session([], "s/", "c/", idempotency_key="key")
+        second = gateway.create_checkout_session([], "s/", "c/", idempotency_key="key")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(gateway.sessions), 1)
+
+    @override_settings(PAYMENT_GATEWAY={"BACKEND": "payment.gateway.LocalGateway"})
+    def test_backend_selected_by_setting(self):
+        self.assertIsInstance(get_gateway(), LocalGateway)
+        self.assertIs(get_gateway(), get_gateway())
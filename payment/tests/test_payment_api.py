@@ -2,21 +2,28 @@ import json
 from datetime import date
 from unittest.mock import patch
 import stripe
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from payment.tests.samples import create_user, sample_payment
+from borrowing.notifications import get_notification_queue
 from borrowing.tests.samples import sample_borrowing, sample_book
-from payment.models import Payment
+from payment.fake_stripe import build_event, signed_request
+from payment.gateway import LocalGateway, PaymentGatewayUnavailable
+from payment.models import StripeEvent
 from payment.serializers import PaymentListSerializer, PaymentSerializer
+from payment.tasks import apply_stripe_events, open_checkout_session
 from payment.views import create_checkout_session
+from payment.webhooks import SESSION_COMPLETED, SESSION_EXPIRED, apply_session_states
 
 
 stripe.api_key = "sk_test_26PHem9AhJZvU623DfE1x4sd"
 
 PAYMENTS_URL = reverse("payment:payment-list")
 BORROWING_URL = reverse("borrowing:borrowing-list")
+WEBHOOK_URL = reverse("payment:stripe-webhook")
+WEBHOOK_SECRET = "whsec_test"
 
 
 def success_url(payment_id):
@@ -61,28 +68,22 @@ class PrivatePaymentsApi(TestCase):
         self.assertEqual(serializer1.data, json.loads(res.content.decode())[0])
         self.assertNotEqual(serializer2.data, json.loads(res.content.decode())[0])
 
-    @patch("stripe.checkout.Session.create")
-    def test_create_session_book_quantity_is_1(self, mock_create_session):
-        mock_create_session.return_value = {
-            "id": "test_session_id",
-            "url": "https://test_url.com",
-        }
+    @patch("payment.views.get_gateway")
+    def test_create_session_book_quantity_is_1(self, mock_get_gateway):
+        gateway = LocalGateway()
+        mock_get_gateway.return_value = gateway
 
         money_to_pay = 1000
         domain_url = "http://127.0.0.1:8000/"
         session_data = create_checkout_session(money_to_pay, domain_url)
 
+        session = gateway.sessions[session_data["session_id"]]
+        self.assertEqual(session_data["session_url"], session["url"])
+        self.assertEqual(session["success_url"], domain_url + "success/")
+        self.assertEqual(session["cancel_url"], domain_url + "cancelled/")
         self.assertEqual(
-            session_data,
-            {"session_id": "test_session_id", "session_url": "https://test_url.com"},
-        )
-
-        mock_create_session.assert_called_once_with(
-            success_url=domain_url + "success/",
-            cancel_url=domain_url + "cancelled/",
-            payment_method_types=["card"],
-            mode="payment",
-            line_items=[
+            session["line_items"],
+            [
                 {
                     "price_data": {
                         "currency": "usd",
@@ -99,7 +100,7 @@ class PrivatePaymentsApi(TestCase):
 
     @patch("borrowing.models.timezone")
     @patch("borrowing.views.BorrowingViewSet.create_payment_for_borrowing")
-    @patch("borrowing.signals.send_notification")
+    @patch("borrowing.signals.send_notification", create=True)
     def test_check_if_create_payment_called_after_borrowing(
         self, mock_send_notification, mock_create_payment_for_borrowing, mock_timezone_models
     ):
@@ -123,21 +124,167 @@ class TestSuccessEndpoint(TestCase):
     def test_success_endpoint(self, mock_send_notifications, mock_session_retrieve):
         book = sample_book()
         borrowing = sample_borrowing(book, self.user)
-        payment = sample_payment(borrowing)
-
-        mock_session_retrieve.return_value = {
-            "id": payment.session_id,
-            "payment_status": "paid",
-        }
+        payment = sample_payment(borrowing, status=1)
 
         response = self.client.get(success_url(payment.id))
 
-        updated_payment = Payment.objects.get(pk=payment.pk)
-        self.assertEqual(updated_payment.status, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        serializer = PaymentSerializer(payment)
+        self.assertEqual(response.data, serializer.data)
+        mock_session_retrieve.assert_not_called()
+
+
+@override_settings(
+    STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+    NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"},
+)
+class StripeWebhookTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email="webhook@test.com", password="testpass")
+
+    def post_event(self, event, secret=WEBHOOK_SECRET):
+        body, signature = signed_request(event, secret)
+        return self.client.post(
+            WEBHOOK_URL,
+            data=body,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature,
+        )
+
+    @patch("payment.tasks.apply_stripe_events.delay")
+    def test_invalid_signature_rejected(self, mock_delay):
+        response = self.post_event(build_event(SESSION_COMPLETED, "cs_1"), secret="whsec_other")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+        mock_delay.assert_not_called()
+
+    @override_settings(STRIPE_WEBHOOK_SECRET=None)
+    @patch("payment.tasks.apply_stripe_events.delay")
+    def test_unconfigured_secret_is_reported(self, mock_delay):
+        with self.assertLogs("payment.views", "ERROR"):
+            response = self.post_event(build_event(SESSION_COMPLETED, "cs_1"))
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(StripeEvent.objects.exists())
+        mock_delay.assert_not_called()
+
+    @patch("payment.tasks.apply_stripe_events.delay")
+    def test_duplicate_events_are_queued_once(self, mock_delay):
+        event = build_event(SESSION_COMPLETED, "cs_1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.post_event(event).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.post_event(event).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        mock_delay.assert_called_once()
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_events_applied_in_bulk(self, mock_send_notification):
+        book = sample_book()
+        borrowings = [sample_borrowing(book, self.user) for _ in range(3)]
+        paid = [sample_payment(borrowing, session_id="cs_paid") for borrowing in borrowings[:2]]
+        expired = sample_payment(borrowings[2], session_id="cs_expired")
+
+        with patch("payment.tasks.apply_stripe_events.delay", side_effect=apply_stripe_events):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post_event(build_event(SESSION_COMPLETED, "cs_paid"))
+                self.post_event(build_event(SESSION_EXPIRED, "cs_expired"))
+
+        for payment in paid:
+            payment.refresh_from_db()
+            self.assertEqual(payment.status, 1)
+        expired.refresh_from_db()
+        self.assertEqual((expired.status, expired.session_id), (0, ""))
+        self.assertFalse(StripeEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(len(get_notification_queue().messages), 1)
+
+
+class PaymentConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = create_user(email="conditional@test.com", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_unchanged_payment_returns_304(self, mock_send_notification):
+        payment = sample_payment(sample_borrowing(sample_book(), self.user))
+        url = reverse("payment:payment-detail", args=[payment.id])
+        response = self.client.get(url)
+
+        with patch("payment.views.PaymentSerializer.to_representation") as mock_serialize:
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            mock_serialize.assert_not_called()
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_new_payment_changes_list_etag(self, mock_send_notification):
+        borrowing = sample_borrowing(sample_book(), self.user)
+        sample_payment(borrowing)
+        etag = self.client.get(PAYMENTS_URL)["ETag"]
+
+        sample_payment(borrowing, session_id="other_id")
 
+        response = self.client.get(PAYMENTS_URL, HTTP_IF_NONE_MATCH=etag)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        serializer = PaymentSerializer(updated_payment)
-        self.assertEqual(response.data, serializer.data)
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_paid_webhook_changes_list_etag(self, mock_send_notification):
+        sample_payment(sample_borrowing(sample_book(), self.user), session_id="cs_paid")
+        etag = self.client.get(PAYMENTS_URL)["ETag"]
+
+        apply_session_states({"cs_paid"}, set(), notify=False)
+
+        response = self.client.get(PAYMENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"})
+class CheckoutSessionTaskTests(TestCase):
+    def setUp(self) -> None:
+        self.user = create_user(email="outbox@test.com", password="testpass")
+        self.base_url = "http://testserver/api/payments/1/"
+
+    @patch("payment.tasks.create_checkout_session")
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_task_stores_session(self, mock_send_notification, mock_session):
+        mock_session.return_value = {"session_id": "cs_1", "session_url": "https://pay"}
+        payment = sample_payment(
+            sample_borrowing(sample_book(), self.user), session_url="", session_id=""
+        )
+
+        open_checkout_session([payment.id], self.base_url)
+
+        payment.refresh_from_db()
+        self.assertEqual((payment.session_id, payment.session_url), ("cs_1", "https://pay"))
+
+    @patch("payment.tasks.create_checkout_session")
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_task_skips_payments_with_session(self, mock_send_notification, mock_session):
+        payment = sample_payment(sample_borrowing(sample_book(), self.user))
+
+        open_checkout_session([payment.id], self.base_url)
+
+        mock_session.assert_not_called()
+
+    @patch("payment.tasks.create_checkout_session")
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_task_retries_on_stripe_error(self, mock_send_notification, mock_session):
+        mock_session.side_effect = [
+            PaymentGatewayUnavailable("Stripe is down"),
+            {"session_id": "cs_2", "session_url": "https://pay"},
+        ]
+        payment = sample_payment(
+            sample_borrowing(sample_book(), self.user), session_url="", session_id=""
+        )
+
+        open_checkout_session.apply(args=([payment.id], self.base_url))
 
-        self.assertEqual(mock_send_notifications.call_count, 2)
+        self.assertEqual(mock_session.call_count, 2)
+        payment.refresh_from_db()
+        self.assertEqual(payment.session_id, "cs_2")
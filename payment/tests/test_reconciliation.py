@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from borrowing.tests.samples import sample_book, sample_borrowing
+from payment.gateway import CircuitOpenError, get_gateway
+from payment.models import Payment
+from payment.reconciliation import reconcile_pending_payments
+from payment.tasks import checkout_idempotency_key, reopen_checkout_sessions
+from payment.tests.samples import create_user, sample_payment
+
+
+@override_settings(
+    PAYMENT_GATEWAY={"BACKEND": "payment.gateway.LocalGateway"},
+    NOTIFICATION_QUEUE={"BACKEND": "borrowing.notifications.MemoryNotificationQueue"},
+)
+class ReconcilePendingPaymentsTests(TestCase):
+    def setUp(self) -> None:
+        self.gateway = get_gateway()
+        self.book = sample_book()
+
+    def sample_pending_payment(self):
+        session = self.gateway.create_checkout_session([], "s/", "c/")
+        user = create_user(email=f"{session['session_id']}@test.com", password="testpass")
+        borrowing = sample_borrowing(self.book, user)
+        return sample_payment(
+            borrowing,
+            session_id=session["session_id"],
+            session_url=session["session_url"],
+        )
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_pages_through_pending_payments(self, mock_send_notification):
+        paid, expired, still_open = (self.sample_pending_payment() for _ in range(3))
+        self.gateway.complete(paid.session_id)
+        self.gateway.expire(expired.session_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = reconcile_pending_payments(chunk_size=1, min_age=0)
+
+        self.assertEqual(
+            {key: stats[key] for key in ("pages", "scanned", "paid", "expired", "failed")},
+            {"pages": 3, "scanned": 3, "paid": 1, "expired": 1, "failed": 0},
+        )
+        paid.refresh_from_db()
+        expired.refresh_from_db()
+        still_open.refresh_from_db()
+        self.assertEqual(paid.status, 1)
+        self.assertEqual((expired.status, expired.session_id), (0, ""))
+        self.assertEqual(still_open.status, 0)
+        self.assertIn(still_open.session_id, self.gateway.sessions)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_recent_payments_left_to_webhook(self, mock_send_notification):
+        payment = self.sample_pending_payment()
+        self.gateway.complete(payment.session_id)
+
+        stats = reconcile_pending_payments()
+
+        self.assertEqual(stats["scanned"], 0)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 0)
+
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_stops_when_circuit_opens(self, mock_send_notification):
+        self.sample_pending_payment()
+
+        with patch.object(self.gateway, "retrieve_session", side_effect=CircuitOpenError()):
+            stats = reconcile_pending_payments(min_age=0)
+
+        self.assertTrue(stats["aborted"])
+        self.assertEqual(Payment.objects.filter(status=0).count(), 1)
+
+    @override_settings(SITE_URL="https://library.test")
+    @patch("payment.tasks.open_checkout_session.delay")
+    @patch("borrowing.signals.send_notification", create=True)
+    def test_lost_sessions_are_reopened(self, mock_send_notification, mock_delay):
+        lost = sample_payment(sample_borrowing(self.book, create_user(email="lost@test.com")), session_id="")
+        recent = sample_payment(sample_borrowing(self.book, create_user(email="new@test.com")), session_id="")
+        self.sample_pending_payment()
+        Payment.objects.filter(pk=lost.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reopen_checkout_sessions(), 1)
+        reopen_checkout_sessions()
+
+        payment_ids, base_url, idempotency_key = mock_delay.call_args.args
+        self.assertEqual(payment_ids, [lost.id])
+        self.assertTrue(base_url.startswith("https://library.test/"))
+        self.assertTrue(base_url.endswith(f"/payments/{lost.id}/"))
+        lost.refresh_from_db()
+        self.assertEqual(idempotency_key, checkout_idempotency_key([lost], base_url))
+        self.assertNotEqual(idempotency_key, checkout_idempotency_key([lost], "http://testserver/"))
+        self.assertEqual(mock_delay.call_args_list[0], mock_delay.call_args_list[1])
+        self.assertNotIn(recent.id, [call.args[0][0] for call in mock_delay.call_args_list])
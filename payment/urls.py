@@ -1,13 +1,14 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from payment.views import PaymentViewSet
+from payment.views import PaymentViewSet, stripe_webhook
 
 router = routers.DefaultRouter()
 
 router.register("payments", PaymentViewSet)
 
 urlpatterns = [
+    path("webhooks/stripe/", stripe_webhook, name="stripe-webhook"),
     path("", include(router.urls)),
 ]
 
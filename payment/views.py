@@ -1,18 +1,31 @@
+import logging
+
 import stripe
+from django.db import transaction
 from django.urls import reverse
-from rest_framework import viewsets, mixins
+from drf_spectacular.utils import extend_schema
+from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.reverse import reverse
 
+from borrowing.cache import get_borrowings_version
+from library_team_project.conditional import ConditionalGetMixin
+from library_team_project.query_budget import QueryBudgetMixin
+from payment.gateway import get_gateway
 from payment.models import Payment
 from payment.serializers import PaymentSerializer, PaymentListSerializer
+from payment.webhooks import HANDLED_EVENTS, record_event
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -22,6 +35,13 @@ class PaymentViewSet(
     queryset = Payment.objects.select_related("borrowing")
     serializer_class = PaymentSerializer
     permission_classes = (IsAuthenticated, )
+    query_budgets = {
+        "list": 3,
+        "retrieve": 3,
+        "create": 4,
+        "success": 2,
+        "cancel": 1,
+    }
 
     def get_queryset(self):
         """Get the queryset based on user permissions."""
@@ -30,6 +50,10 @@ class PaymentViewSet(
 
         return self.queryset.filter(borrowing__user=self.request.user)
 
+    def get_conditional_version(self):
+        """Lists follow the versions of the user's borrowings when the cache is shared."""
+        return get_borrowings_version(self.request.user)
+
     def get_serializer_class(self):
         """Get the appropriate serializer class based on the action."""
         if self.action == "list":
@@ -39,14 +63,13 @@ class PaymentViewSet(
 
     @action(methods=["GET"], detail=True, url_path="success")
     def success(self, request, pk=None):
-        """Handle successful payment sessions."""
-        session_id = self.get_object().session_id
-        payment = Payment.objects.get(session_id=session_id)
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        session = stripe.checkout.Session.retrieve(session_id)
-        if session["payment_status"] == "paid":
-            payment.status = 1
-            payment.save()
+        """
+        Show the payment after a successful checkout.
+
+        The status is updated from Stripe webhook events, so this only reads
+        local state.
+        """
+        payment = self.get_object()
         serializer = PaymentSerializer(payment)
         return Response(serializer.data)
 
@@ -56,30 +79,69 @@ class PaymentViewSet(
         return Response({"detail": "You can make your pay in next 24 hours"})
 
 
-def create_checkout_session(money_to_pay: int, domain_url: str):
-    """Create a checkout session for Stripe payment."""
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+def build_line_item(money_to_pay: int, name: str = "Book", description: str = "Book borrowing"):
+    """Build a Stripe line item for a single borrowed book."""
+    return {
+        "price_data": {
+            "currency": "usd",
+            "unit_amount": money_to_pay,
+            "product_data": {
+                "name": name,
+                "description": description,
+            },
+        },
+        "quantity": 1,
+    }
+
+
+def create_checkout_session(money_to_pay: int, domain_url: str, line_items=None, idempotency_key=None):
+    """
+    Create a checkout session through the configured payment gateway.
+
+    Pass ``line_items`` to pay for several books in one session; by default
+    a single item of ``money_to_pay`` cents is charged. Raises
+    ``PaymentGatewayError`` when the session cannot be created.
+    """
+    if line_items is None:
+        line_items = [build_line_item(money_to_pay)]
+    return get_gateway().create_checkout_session(
+        line_items,
+        success_url=domain_url + "success/",
+        cancel_url=domain_url + "cancelled/",
+        idempotency_key=idempotency_key,
+    )
+
+
+@extend_schema(exclude=True)
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def stripe_webhook(request):
+    """Receive Stripe checkout session events and queue them for processing."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        logger.error("Stripe webhook received, but STRIPE_WEBHOOK_SECRET is not set.")
+        return Response(
+            {"detail": "Stripe webhooks are not configured."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
     try:
-        checkout_session = stripe.checkout.Session.create(
-            success_url=domain_url + "success/",
-            cancel_url=domain_url + "cancelled/",
-            payment_method_types=["card"],
-            mode="payment",
-            line_items=[{
-                "price_data": {
-                    "currency": "usd",
-                    "unit_amount": money_to_pay,
-                    "product_data": {
-                        "name": "Book",
-                        "description": "Book borrowing",
-                    },
-                },
-                "quantity": 1,
-            }],
+        event = stripe.Webhook.construct_event(
+            request.body,
+            request.META.get("HTTP_STRIPE_SIGNATURE", ""),
+            settings.STRIPE_WEBHOOK_SECRET,
         )
-        return {"session_id": checkout_session["id"], "session_url": checkout_session["url"]}
-    except Exception as e:
-        return {"error": str(e)}
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return Response(
+            {"detail": "Invalid Stripe event."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if event["type"] in HANDLED_EVENTS and record_event(event.to_dict_recursive()):
+        from payment.tasks import apply_stripe_events
+
+        transaction.on_commit(apply_stripe_events.delay, robust=True)
+
+    return Response(status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from borrowing.cache import invalidate_borrowings
+from payment.models import Payment, StripeEvent
+
+SESSION_COMPLETED = "checkout.session.completed"
+SESSION_EXPIRED = "checkout.session.expired"
+HANDLED_EVENTS = (SESSION_COMPLETED, SESSION_EXPIRED)
+
+
+def record_event(event) -> bool:
+    """
+    Store a verified Stripe event unless it was received before.
+
+    Stripe delivers events at least once, so the event ID is the
+    deduplication key. Returns whether the event is new.
+    """
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event["id"],
+        defaults={"type": event["type"], "payload": event},
+    )
+    return created
+
+
+def apply_events(events, notify=True):
+    """Apply checkout session events to payments with set-based updates."""
+    paid_sessions, expired_sessions = set(), set()
+    for event in events:
+        session = event.payload["data"]["object"]
+        if event.type == SESSION_COMPLETED and session.get("payment_status") == "paid":
+            paid_sessions.add(session["id"])
+        elif event.type == SESSION_EXPIRED:
+            expired_sessions.add(session["id"])
+    return apply_session_states(paid_sessions, expired_sessions, notify=notify)
+
+
+def apply_session_states(paid_sessions, expired_sessions, notify=True):
+    """
+    Update pending payments from the state of their checkout sessions.
+
+    Paid sessions mark their pending payments as paid. Expired sessions are
+    cleared from pending payments, so a new session is opened for them the
+    next time one is needed. Returns the number of payments of each kind.
+    """
+    now = timezone.now()
+    paid = list(
+        Payment.objects.filter(session_id__in=paid_sessions, status=0)
+        .select_for_update(of=("self",))
+        .only("id", "borrowing_id", "money_to_pay")
+        .annotate(user_id=F("borrowing__user_id"))
+    )
+    Payment.objects.filter(pk__in=[payment.id for payment in paid]).update(
+        status=1, updated_at=now
+    )
+    if paid:
+        invalidate_borrowings(payment.user_id for payment in paid)
+    expired = Payment.objects.filter(
+        session_id__in=set(expired_sessions) - set(paid_sessions), status=0
+    ).update(session_url="", session_id="", updated_at=now)
+
+    if paid and notify:
+        from borrowing.signals import notify_payments_completed
+
+        notify_payments_completed(paid)
+
+    return {"paid": len(paid), "expired": expired}
+
+
+def apply_pending_events(batch_size=None, notify=True):
+    """
+    Apply every stored, unprocessed event in batches.
+
+    Rows are claimed with ``SKIP LOCKED`` where the database supports it, so
+    concurrent workers split the backlog instead of applying it twice.
+    """
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    stats = {"events": 0, "paid": 0, "expired": 0}
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .order_by("id")[:batch_size]
+            )
+            if not events:
+                return stats
+            applied = apply_events(events, notify=notify)
+            StripeEvent.objects.filter(pk__in=[event.id for event in events]).update(
+                processed_at=timezone.now()
+            )
+        stats["events"] += len(events)
+        stats["paid"] += applied["paid"]
+        stats["expired"] += applied["expired"]
@@ -1,18 +1,21 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 
+from library_team_project.query_budget import QueryBudgetMixin
 from user.serializers import UserSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(QueryBudgetMixin, generics.CreateAPIView):
     """View for creating a new user."""
     serializer_class = UserSerializer
+    query_budgets = {"post": 2}
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(QueryBudgetMixin, generics.RetrieveUpdateAPIView):
     """View for retrieving and updating the authenticated user's details."""
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
+    query_budgets = {"get": 1, "put": 3, "patch": 3}
 
     def get_object(self):
         """Retrieve the authenticated user."""